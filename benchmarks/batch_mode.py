@@ -0,0 +1,110 @@
+"""pastiche.batch end to end against FakeBatchProvider, asserting the batches submitted and live calls made.
+
+- a backfill goes through one prompt and one image batch, with no live call
+  but for the image request the batch failed,
+- a rerun submits nothing,
+- a run interrupted while polling resumes its batch instead of resubmitting it.
+
+Exits non-zero on any mismatch.
+
+    python -m benchmarks.batch_mode
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from openai import AsyncOpenAI
+
+from benchmarks.fake_openai import FakeBatchProvider, FakeOpenAI
+from benchmarks.synthetic_games import API_RPM, games
+from pastiche import batch, gen
+from pastiche.generation_cache import GenerationCache
+from pastiche.images import PublishedDerivatives
+from pastiche.scheduler import RequestScheduler
+from pastiche.storage import LocalBackend
+
+N_GAMES = 40
+
+
+def image_key(game) -> str:
+    return gen.image_cache_key(
+        gen.prompt_cache_key(game.clue_sentence, game.solution_unjumbled)
+    )
+
+
+class InterruptedProvider(FakeBatchProvider):
+    def status(self, batch_id: str) -> str:
+        raise KeyboardInterrupt
+
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp_dir, FakeOpenAI(
+        chat_latency=0.01, image_latency=0.01, image_size=256
+    ) as fake:
+        tmp_dir = Path(tmp_dir)
+        raw_dir, resized_dir = tmp_dir / "raw", tmp_dir / "resized"
+        raw_dir.mkdir()
+        resized_dir.mkdir()
+        provider_root = tmp_dir / "provider"
+
+        def run(
+            name: str, games: list, provider, expected_batches: int, expected_calls: int
+        ):
+            submitted, served = FakeBatchProvider(provider_root).submitted, fake.served
+            start = time.perf_counter()
+            batch.run_batch(
+                games,
+                raw_dir,
+                resized_dir,
+                provider,
+                work_dir=tmp_dir / "work",
+                cache=GenerationCache(tmp_dir / "cache"),
+                poll_interval=0,
+                storage=LocalBackend(tmp_dir / "bucket", overwrite=True),
+                published=PublishedDerivatives(tmp_dir / "published.json"),
+                client=AsyncOpenAI(
+                    base_url=fake.base_url, api_key="fake", max_retries=0
+                ),
+                prompt_scheduler=RequestScheduler(API_RPM),
+                image_scheduler=RequestScheduler(API_RPM),
+                processes=1,
+                report_interval=None,
+            )
+            elapsed = time.perf_counter() - start
+            batches = FakeBatchProvider(provider_root).submitted - submitted
+            calls = fake.served - served
+            cache = GenerationCache(tmp_dir / "cache")
+            published = all(cache.output(game.id) == image_key(game) for game in games)
+            ok = batches == expected_batches and calls == expected_calls and published
+            print(
+                f"{name:<26} {batches:>2} batches {calls:>3} live calls {elapsed:>6.2f}s  "
+                + (
+                    "ok"
+                    if ok
+                    else f"FAIL (expected {expected_batches} batches, {expected_calls} live calls, published={published})"
+                )
+            )
+            if not ok:
+                failures.append(name)
+
+        backfill = games(1, N_GAMES)
+        provider = FakeBatchProvider(provider_root, failing={image_key(backfill[0])})
+        run("backfill", backfill, provider, 2, 1)
+        run("rerun", backfill, FakeBatchProvider(provider_root), 0, 0)
+
+        new_days = games(N_GAMES + 1, N_GAMES + 10)
+        try:
+            run("interrupted", new_days, InterruptedProvider(provider_root), 1, 0)
+        except KeyboardInterrupt:
+            pass
+        # the prompt batch of the interrupted run, and the image batch
+        run("resumed", new_days, FakeBatchProvider(provider_root), 1, 0)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Cold start of the serving app: `import pastiche.main` time and time-to-first-response under uvicorn.
+
+Exits non-zero when the medians exceed the given thresholds, so it can gate a
+build. Run from the repository root:
+
+    python -m benchmarks.cold_start --max-import-ms 1500 --max-first-response-ms 4000
+"""
+
+import argparse
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from urllib.error import URLError
+
+from pastiche.config import LOCAL_DB_PATH
+
+IMPORT_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+import pastiche.main
+elapsed = time.perf_counter() - start
+heavy = sorted(m for m in ("pandas", "tqdm", "pastiche.game") if m in sys.modules)
+print(elapsed, ",".join(heavy))
+"""
+
+
+def measure_import() -> tuple[float, str]:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    return float(output[0]), output[1] if len(output) > 1 else ""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_game_path() -> str:
+    with sqlite3.connect(LOCAL_DB_PATH) as conn:
+        (value_date,) = conn.execute(
+            "SELECT date(value_date) FROM jumble_games ORDER BY value_date LIMIT 1"
+        ).fetchone()
+    return f"/{value_date}"
+
+
+def measure_first_response(path: str, timeout: float = 30) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "pastiche.main:app", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}") as r:
+                    if r.status == 200:
+                        return time.perf_counter() - start
+            except (URLError, ConnectionError):
+                time.sleep(0.01)
+        raise TimeoutError(f"no response from {path} after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=1500)
+    parser.add_argument("--max-first-response-ms", type=float, default=4000)
+    args = parser.parse_args()
+
+    imports, heavy_modules = zip(*(measure_import() for _ in range(args.runs)))
+    path = first_game_path()
+    first_responses = [measure_first_response(path) for _ in range(args.runs)]
+
+    import_ms = statistics.median(imports) * 1e3
+    first_response_ms = statistics.median(first_responses) * 1e3
+    print(f"import pastiche.main: {import_ms:.0f} ms (median of {args.runs})")
+    print(f"first response {path}: {first_response_ms:.0f} ms (median of {args.runs})")
+
+    failures = []
+    if heavy_modules[0]:
+        failures.append(f"serving imports ingest-only modules: {heavy_modules[0]}")
+    if import_ms > args.max_import_ms:
+        failures.append(f"import time above {args.max_import_ms:.0f} ms")
+    if first_response_ms > args.max_first_response_ms:
+        failures.append(
+            f"time to first response above {args.max_first_response_ms:.0f} ms"
+        )
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
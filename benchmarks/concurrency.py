@@ -0,0 +1,95 @@
+"""Throughput of the daily page under 1, 10 and 100 concurrent clients.
+
+Every request asks for a different date with the caches cleared, so each one
+reaches the database. "inline" runs the database calls on the event loop as
+the handlers used to, "executor" goes through pastiche.database's thread pool.
+Along with throughput, reports the longest stretch the event loop was blocked
+(how late a 1 ms ticker woke up), which is what other requests wait on.
+
+    python -m benchmarks.concurrency
+"""
+
+import asyncio
+import time
+from datetime import timedelta
+
+import httpx
+from sqlalchemy import func, select
+
+from pastiche import main, tables
+from pastiche.config import LOCAL_GAMES_PATH
+from pastiche.database import SessionLocal
+from pastiche.ingest import check_and_populate_db
+
+CONCURRENCY = [1, 10, 100]
+
+
+async def run_inline(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+async def max_loop_stall(stop: asyncio.Event) -> float:
+    stall = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        stall = max(stall, time.perf_counter() - start - 0.001)
+    return stall
+
+
+async def throughput(dates: list, n_clients: int) -> tuple[float, float]:
+    main.game_cache.clear()
+    main.page_cache.clear()
+    queue = asyncio.Queue()
+    for value_date in dates:
+        queue.put_nowait(value_date)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def worker():
+            while not queue.empty():
+                value_date = queue.get_nowait()
+                response = await client.get(f"/{value_date}")
+                assert response.status_code == 200
+
+        stop = asyncio.Event()
+        monitor = asyncio.create_task(max_loop_stall(stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(n_clients)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        return len(dates) / elapsed, await monitor
+
+
+async def bench():
+    check_and_populate_db(LOCAL_GAMES_PATH)
+    with SessionLocal() as db:
+        first_day, last_day = db.execute(
+            select(
+                func.min(tables.JumbleGame.value_day),
+                func.max(tables.JumbleGame.value_day),
+            )
+        ).one()
+    dates = [
+        first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)
+    ]
+
+    print(
+        f"{'clients':>8} {'inline (req/s)':>15} {'stall (ms)':>11} {'executor (req/s)':>17} {'stall (ms)':>11}"
+    )
+    executor_runner = main.run_in_db_executor
+    for n_clients in CONCURRENCY:
+        main.run_in_db_executor = run_inline
+        inline, inline_stall = await throughput(dates, n_clients)
+        main.run_in_db_executor = executor_runner
+        executor, executor_stall = await throughput(dates, n_clients)
+        print(
+            f"{n_clients:>8} {inline:>15.0f} {inline_stall * 1e3:>11.2f} {executor:>17.0f} {executor_stall * 1e3:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(bench())
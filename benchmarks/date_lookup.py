@@ -0,0 +1,74 @@
+"""Per-lookup latency of crud.read_jumble_game as the jumble_games table grows.
+
+Compares the indexed value_day lookup against the former extract() filters.
+
+    python -m benchmarks.date_lookup
+"""
+
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, extract, insert
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.synthetic_games import game_rows
+from pastiche import crud, tables
+from pastiche.config import RESET_DATE
+
+SIZES = [1_000, 10_000, 100_000]
+N_LOOKUPS = 200
+
+
+def build_db(path: Path, n_games: int):
+    engine = create_engine(f"sqlite:///{path}")
+    tables.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(tables.JumbleGame), [game for game, _ in game_rows(n_games)]
+        )
+    return engine
+
+
+def read_jumble_game_extract(db, value_date: datetime):
+    return (
+        db.query(tables.JumbleGame)
+        .filter(
+            extract("year", tables.JumbleGame.value_date) == value_date.year,
+            extract("month", tables.JumbleGame.value_date) == value_date.month,
+            extract("day", tables.JumbleGame.value_date) == value_date.day,
+        )
+        .first()
+    )
+
+
+def time_lookups(SessionLocal, lookup, dates: list[datetime]) -> float:
+    with SessionLocal() as db:
+        start = time.perf_counter()
+        for value_date in dates:
+            assert lookup(db, value_date) is not None
+        return (time.perf_counter() - start) / len(dates)
+
+
+def main():
+    print(f"{'games':>8} {'extract (ms)':>14} {'value_day (ms)':>16} {'speedup':>9}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_games in SIZES:
+            engine = build_db(Path(tmp_dir) / f"bench_{n_games}.db", n_games)
+            SessionLocal = sessionmaker(bind=engine)
+            dates = [
+                RESET_DATE + timedelta(days=random.randrange(n_games))
+                for _ in range(N_LOOKUPS)
+            ]
+            legacy = time_lookups(SessionLocal, read_jumble_game_extract, dates)
+            indexed = time_lookups(SessionLocal, crud.read_jumble_game, dates)
+            print(
+                f"{n_games:>8} {legacy * 1e3:>14.3f} {indexed * 1e3:>16.3f} {legacy / indexed:>8.1f}x"
+            )
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Local stand-in for jumbleanswer.com, serving the saved answer pages of benchmarks/fixtures/jumbleanswer.
+
+The corpus holds a day's page per file, named after the day: 26 consecutive
+days of November 2021 rendered in the site's WordPress markup from the
+archived games (with varying inline markup around the jumbles, comments,
+sidebar and footer), and three broken pages after them: no answers posted
+yet, an intro paragraph before the jumbles and a page cut off mid-transfer.
+2021-11-20 and 2021-11-30 have no page. Then 2022-07-27 and 2022-07-28,
+whose page the site publishes under the previous day's path, as in the
+archive: /2022/07/27/jumble-answers-for-7-28-22/.
+
+Like the site, a day's URL redirects to the day's canonical URL (the page's
+rel="canonical" link, the URL scraped games are keyed on) and days without a
+page are 404s. So the whole Scrapy stack runs offline against it:
+
+    with FakeJumbleSite() as site:
+        process.crawl(JumbleAnswersSpider, raw_url=site.base_url, ...)
+"""
+
+import re
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures/jumbleanswer"
+CANONICAL_LINK = re.compile(rb'<link rel="canonical" href="https?://[^/"]+(/[^"]*)">')
+# jumble-answers-for-M-D-YY, the date the page is for whatever its path
+SLUG_DATE = re.compile(r"-(\d{1,2})-(\d{1,2})-(\d{2})/?$")
+
+
+def load_pages(fixtures_dir: Path = FIXTURES_DIR) -> dict[date, bytes]:
+    return {
+        date.fromisoformat(path.stem): path.read_bytes()
+        for path in sorted(fixtures_dir.glob("*.html"))
+    }
+
+
+def canonical_path(value_date: date, page: bytes = b"") -> str:
+    """Path of the page's canonical link, the day's path if it has none"""
+    match = CANONICAL_LINK.search(page)
+    if match:
+        return match.group(1).decode()
+    return (
+        f"/{value_date:%Y/%m/%d}/jumble-answers-for-"
+        f"{value_date.month}-{value_date.day}-{value_date:%y}/"
+    )
+
+
+class FakeJumbleSite(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fixtures_dir: Path = FIXTURES_DIR, latency: float = 0.0) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.pages = load_pages(fixtures_dir)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.served = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def __enter__(self) -> "FakeJumbleSite":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        server = self.server
+        match = SLUG_DATE.search(self.path)
+        try:
+            month, day, year = (int(part) for part in match.groups())
+            value_date = date(2000 + year, month, day)
+        except (AttributeError, ValueError):
+            value_date = None
+        if value_date not in server.pages:
+            self._send(404, b"<html><body><h1>Page not found</h1></body></html>")
+            return
+        page = server.pages[value_date]
+        if self.path != canonical_path(value_date, page):
+            self._send(301, b"", {"Location": canonical_path(value_date, page)})
+            return
+
+        time.sleep(server.latency)
+        with server.lock:
+            server.served += 1
+        self._send(200, page)
+
+    def _send(self, status: int, body: bytes, headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
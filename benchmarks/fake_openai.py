@@ -0,0 +1,254 @@
+"""Local stand-ins for the OpenAI chat completion and image generation endpoints, and for a batch API.
+
+Enforces requests (and tokens) per minute with token buckets holding a second
+of the limit, the granularity the API enforces them at. Over the limit it
+answers 429 with a retry-after-ms header, like the real API, so the OpenAI
+client raises its real RateLimitError.
+
+    with FakeOpenAI(rpm=600) as fake:
+        client = AsyncOpenAI(base_url=fake.base_url, api_key="fake", max_retries=0)
+
+FakeBatchProvider does the same for pastiche.batch, offline and file-based.
+"""
+
+import base64
+import json
+import shutil
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+from pastiche.batch import CHAT_ENDPOINT, IMAGES_ENDPOINT, BatchProvider
+
+
+class _Bucket:
+    """A second's worth of the per-minute limit, refilled continuously"""
+
+    def __init__(self, per_minute: float | None) -> None:
+        self.rate = per_minute / 60 if per_minute else None
+        self.tokens = self.rate
+        self.updated = time.monotonic()
+
+    def admit(self, amount: float, now: float) -> float:
+        """0 if admitted, else seconds until it would be"""
+        if self.rate is None:
+            return 0.0
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        amount = min(amount, self.rate)
+        if self.tokens < amount:
+            return (amount - self.tokens) / self.rate
+        self.tokens -= amount
+        return 0.0
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        rpm: float | None = None,
+        tpm: float | None = None,
+        image_rpm: float | None = None,
+        chat_latency: float = 0.1,
+        image_latency: float = 0.5,
+        image_size: int = 1024,
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.chat_requests, self.chat_tokens = _Bucket(rpm), _Bucket(tpm)
+        self.image_requests = _Bucket(image_rpm)
+        self.chat_latency = chat_latency
+        self.image_latency = image_latency
+        self.lock = threading.Lock()
+        self.served = 0
+        self.rate_limited = 0
+
+        buffer = BytesIO()
+        Image.effect_mandelbrot(
+            (image_size, image_size), (-2, -1.5, 1, 1.5), 100
+        ).convert("RGB").save(buffer, "PNG")
+        self.b64_png = base64.b64encode(buffer.getvalue()).decode()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}/v1"
+
+    def __enter__(self) -> "FakeOpenAI":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        now = time.monotonic()
+        if self.path.endswith("/chat/completions"):
+            content = " ".join(m["content"] for m in body["messages"])
+            prompt_tokens = len(content) // 4
+            completion = f"A scene inspired by: {body['messages'][-1]['content']}"
+            completion_tokens = len(completion) // 4
+            with server.lock:
+                wait = server.chat_requests.admit(1, now) or server.chat_tokens.admit(
+                    prompt_tokens + completion_tokens, now
+                )
+            latency = server.chat_latency
+            payload = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": completion},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+        elif self.path.endswith("/images/generations"):
+            with server.lock:
+                wait = server.image_requests.admit(1, now)
+            latency = server.image_latency
+            payload = {
+                "created": int(time.time()),
+                "data": [{"b64_json": server.b64_png}],
+            }
+        else:
+            self._send(404, {"error": {"message": "not found", "code": None}})
+            return
+
+        if wait:
+            with server.lock:
+                server.rate_limited += 1
+            error = {
+                "message": "Rate limit reached",
+                "type": "requests",
+                "param": None,
+                "code": "rate_limit_exceeded",
+            }
+            self._send(429, {"error": error}, {"retry-after-ms": f"{wait * 1000:.0f}"})
+            return
+        time.sleep(latency)
+        with server.lock:
+            server.served += 1
+        self._send(200, payload)
+
+    def _send(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class FakeBatchProvider(BatchProvider):
+    """File-based stand-in for a batch API: batches complete after a few polls, with fake results.
+
+    All its state lives under root, so a new instance over the same root picks
+    up the batches of an interrupted run. Requests whose custom id is in
+    failing get an error result.
+    """
+
+    endpoints = frozenset({CHAT_ENDPOINT, IMAGES_ENDPOINT})
+
+    def __init__(
+        self, root: Path, polls: int = 2, failing: set[str] = frozenset()
+    ) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.polls = polls
+        self.failing = failing
+
+    @property
+    def submitted(self) -> int:
+        return sum(1 for path in self.root.iterdir() if path.is_dir())
+
+    def submit(self, jobs_path: Path, endpoint: str) -> str:
+        batch_id = f"batch_{self.submitted + 1}"
+        batch_dir = self.root / batch_id
+        batch_dir.mkdir()
+        shutil.copyfile(jobs_path, batch_dir / "input.jsonl")
+        self._write_state(batch_id, {"status": "validating", "polls": 0})
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        state = json.loads((self.root / batch_id / "state.json").read_text())
+        if state["status"] != "completed":
+            state["polls"] += 1
+            state["status"] = "in_progress"
+            if state["polls"] >= self.polls:
+                self._complete(batch_id)
+                state["status"] = "completed"
+            self._write_state(batch_id, state)
+        return state["status"]
+
+    def download(self, batch_id: str, results_path: Path) -> None:
+        shutil.copyfile(self.root / batch_id / "output.jsonl", results_path)
+
+    def _write_state(self, batch_id: str, state: dict) -> None:
+        (self.root / batch_id / "state.json").write_text(json.dumps(state))
+
+    def _complete(self, batch_id: str) -> None:
+        batch_dir = self.root / batch_id
+        with open(batch_dir / "input.jsonl") as jobs, open(
+            batch_dir / "output.jsonl", "w"
+        ) as output:
+            for line in jobs:
+                job = json.loads(line)
+                if job["custom_id"] in self.failing:
+                    response = {
+                        "status_code": 400,
+                        "body": {"error": {"message": "bad request"}},
+                    }
+                elif job["url"] == CHAT_ENDPOINT:
+                    content = (
+                        f"A scene inspired by: {job['body']['messages'][-1]['content']}"
+                    )
+                    response = {
+                        "status_code": 200,
+                        "body": {"choices": [{"message": {"content": content}}]},
+                    }
+                else:
+                    response = {
+                        "status_code": 200,
+                        "body": {"data": [{"b64_json": _small_png()}]},
+                    }
+                result = {
+                    "id": f"{batch_id}-{job['custom_id']}",
+                    "custom_id": job["custom_id"],
+                }
+                output.write(
+                    json.dumps({**result, "response": response, "error": None}) + "\n"
+                )
+
+
+@lru_cache(maxsize=1)
+def _small_png() -> str:
+    buffer = BytesIO()
+    Image.effect_mandelbrot((256, 256), (-2, -1.5, 1, 1.5), 100).convert("RGB").save(
+        buffer, "PNG"
+    )
+    return base64.b64encode(buffer.getvalue()).decode()
@@ -0,0 +1,112 @@
+"""JumbleGame.find_indices: former nested-scan implementation vs per-letter cursors.
+
+Checks both produce the same clue indices on randomly generated inputs
+(including repeated letters, duplicate jumbles and missing letters) and on
+every game of the corpus, then times them over the corpus.
+
+    python -m benchmarks.find_indices
+"""
+
+import json
+import random
+import time
+
+from pastiche.config import LOCAL_GAMES_PATH
+from pastiche.game import Jumble, JumbleGame
+
+N_RANDOM_CASES = 5_000
+REPEAT = 20
+
+
+def find_indices_legacy(solution: str, jumbles: list[Jumble]):
+    solution_letters = list(solution)
+    letter_indices = {word: [] for word in jumbles}
+    used_indices = {word: [] for word in jumbles}
+
+    for s_letter in solution_letters:
+        found = False
+        for jumble in jumbles:
+            for i, w_letter in enumerate(jumble.unjumbled):
+                if s_letter == w_letter and i not in used_indices[jumble]:
+                    letter_indices[jumble].append(i)
+                    used_indices[jumble].append(i)
+                    found = True
+                    break
+            if found:
+                break
+
+        if not found:
+            raise ValueError(
+                f"Letter {s_letter} not found in any word of the initial list."
+            )
+
+    return letter_indices
+
+
+def outcome(find_indices, solution: str, jumbles: list[Jumble]):
+    try:
+        return list(find_indices(solution, jumbles).items())
+    except ValueError as e:
+        return str(e)
+
+
+def random_case(rng: random.Random) -> tuple[str, list[Jumble]]:
+    alphabet = "ABCDE"
+    words = [
+        "".join(rng.choices(alphabet, k=rng.randint(3, 7)))
+        for _ in range(rng.randint(1, 5))
+    ]
+    if rng.random() < 0.2:
+        words.append(rng.choice(words))
+    jumbles = [Jumble(jumbled=word, unjumbled=word) for word in words]
+    pool = "".join(words)
+    solution = "".join(rng.sample(pool, rng.randint(1, len(pool))))
+    if rng.random() < 0.1:
+        solution += "Z"
+    return solution, jumbles
+
+
+def corpus_cases() -> list[tuple[str, list[Jumble]]]:
+    cases = []
+    with open(LOCAL_GAMES_PATH) as file:
+        for line in file:
+            data = json.loads(line)
+            game = JumbleGame.from_dict(data)
+            jumbles = [Jumble(**t) for t in data["jumbles"]]
+            cases.append((game.solution, jumbles))
+    return cases
+
+
+def timeit(find_indices, cases) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for solution, jumbles in cases:
+            find_indices(solution, jumbles)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = random.Random(0)
+    for _ in range(N_RANDOM_CASES):
+        solution, jumbles = random_case(rng)
+        assert outcome(find_indices_legacy, solution, jumbles) == outcome(
+            JumbleGame.find_indices, solution, jumbles
+        ), (solution, jumbles)
+
+    cases = corpus_cases()
+    for solution, jumbles in cases:
+        assert outcome(find_indices_legacy, solution, jumbles) == outcome(
+            JumbleGame.find_indices, solution, jumbles
+        ), (solution, jumbles)
+    print(f"same clue indices on {N_RANDOM_CASES} random cases and {len(cases)} games")
+
+    legacy = timeit(find_indices_legacy, cases)
+    cursors = timeit(JumbleGame.find_indices, cases)
+    print(f"{'legacy (ms)':>12} {'cursors (ms)':>13} {'speedup':>9}")
+    print(f"{legacy * 1e3:>12.3f} {cursors * 1e3:>13.3f} {legacy / cursors:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""API calls and time of gen.generate_jumble_images reruns with the generation cache.
+
+Runs against the local fake OpenAI API, asserting the number of calls made:
+- a first run pays for every prompt and image,
+- a rerun over the same games makes none (and uploads nothing),
+- after a rebuild renumbering the games, none either: the images are
+  re-encoded from the cache and republished under their new ids,
+- editing one game's clue costs just that game's prompt and image.
+
+Then checks the reloaded manifest journal was compacted to one line per entry,
+and times recording a backfill's entries in it vs rewriting the whole
+manifest per entry, as the cache formerly did.
+
+Exits non-zero on any mismatch.
+
+    python -m benchmarks.generation_cache
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from openai import AsyncOpenAI
+
+from benchmarks.fake_openai import FakeOpenAI
+from benchmarks.synthetic_games import API_RPM, games
+from pastiche import gen
+from pastiche.generation_cache import GenerationCache
+from pastiche.images import PublishedDerivatives
+from pastiche.scheduler import RequestScheduler
+from pastiche.storage import LocalBackend
+from pastiche.utils import write_json_atomic
+
+N_GAMES = 12
+BACKFILL_SIZES = [250, 1000]
+
+
+class FormerGenerationCache(GenerationCache):
+    """Rewrote the whole manifest on every entry put"""
+
+    def _append(self, name: str, key: str, value: str) -> None:
+        write_json_atomic(
+            self.root / "manifest.json",
+            {"prompts": self.prompts, "images": self.images, "outputs": self.outputs},
+            indent=2,
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+
+
+def time_backfill(
+    cache_class: type[GenerationCache], root: Path, n_games: int
+) -> float:
+    """Time recording the prompt, image and output of n_games games"""
+    cache = cache_class(root)
+    start = time.perf_counter()
+    for i in range(n_games):
+        key = f"{i:064x}"
+        cache.put_prompt(
+            key, f"A prompt for game {i}, two or three sentences long. " * 3
+        )
+        with cache._lock:
+            cache.images[key] = f"images/{key[:2]}/{key}.png"
+            cache._append("images", key, cache.images[key])
+        cache.set_output(i, key)
+    return time.perf_counter() - start
+
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp_dir, FakeOpenAI(
+        chat_latency=0.05, image_latency=0.2, image_size=256
+    ) as fake:
+        tmp_dir = Path(tmp_dir)
+        raw_dir, resized_dir = tmp_dir / "raw", tmp_dir / "resized"
+        raw_dir.mkdir()
+        resized_dir.mkdir()
+        storage = LocalBackend(tmp_dir / "bucket", overwrite=True)
+
+        def run(name: str, games: list, expected_calls: int):
+            cache = GenerationCache(tmp_dir / "cache")
+            served = fake.served
+            start = time.perf_counter()
+            gen.generate_jumble_images(
+                raw_dir,
+                games,
+                resized_dir,
+                storage=storage,
+                client=AsyncOpenAI(
+                    base_url=fake.base_url, api_key="fake", max_retries=0
+                ),
+                prompt_scheduler=RequestScheduler(API_RPM),
+                image_scheduler=RequestScheduler(API_RPM),
+                cache=cache,
+                published=PublishedDerivatives(tmp_dir / "published.json"),
+                processes=1,
+                report_interval=None,
+            )
+            elapsed = time.perf_counter() - start
+            calls = fake.served - served
+            cache = GenerationCache(tmp_dir / "cache")
+            derivatives = PublishedDerivatives(tmp_dir / "published.json")
+            published = all(
+                game.id in derivatives
+                and cache.output(game.id)
+                == gen.image_cache_key(
+                    gen.prompt_cache_key(game.clue_sentence, game.solution_unjumbled)
+                )
+                for game in games
+            )
+            ok = calls == expected_calls and published
+            print(
+                f"{name:<28} {calls:>4} API calls {elapsed:>7.2f}s  "
+                + (
+                    "ok"
+                    if ok
+                    else f"FAIL (expected {expected_calls}, published={published})"
+                )
+            )
+            if not ok:
+                failures.append(name)
+
+        run("first run", games(1, N_GAMES), 2 * N_GAMES)
+        run("rerun, nothing changed", games(1, N_GAMES), 0)
+        run("rebuild renumbered ids", games(1, N_GAMES, id_offset=1), 0)
+        run("one clue edited", games(1, N_GAMES, id_offset=1, edited=3), 2)
+
+        cache = GenerationCache(tmp_dir / "cache")
+        n_entries = len(cache.prompts) + len(cache.images) + len(cache.outputs)
+        n_lines = len(cache.journal_path.read_text().splitlines())
+        print(f"manifest journal: {n_lines} lines for {n_entries} entries")
+        if n_lines != n_entries:
+            failures.append("journal")
+
+        print(f"{'backfill':>8} {'rewrite (s)':>12} {'journal (s)':>12}")
+        for n_games in BACKFILL_SIZES:
+            former = time_backfill(
+                FormerGenerationCache, tmp_dir / f"former-{n_games}", n_games
+            )
+            journal = time_backfill(
+                GenerationCache, tmp_dir / f"journal-{n_games}", n_games
+            )
+            print(f"{n_games:>8} {former:>12.2f} {journal:>12.2f}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""gen.generate_jumble_images end to end against a local fake OpenAI API and local storage.
+
+The fake answers after a scaled-down API latency with a real PNG, so encoding
+is the actual CPU work: on few cores it bounds both designs, the per-stage
+report shows which stage is the bottleneck. Compares the former design (each
+of 4 threads running prompt, image, encode and upload for one game at a time)
+with the staged pipeline, and checks every game ends up fully uploaded.
+
+    python -m benchmarks.image_pipeline
+"""
+
+import base64
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from openai import AsyncOpenAI, OpenAI
+
+from benchmarks.fake_openai import FakeOpenAI
+from benchmarks.synthetic_games import API_RPM, games
+from pastiche import config, gen
+from pastiche.generation_cache import GenerationCache
+from pastiche.images import PublishedDerivatives
+from pastiche.images import IMAGE_FORMATS, derivative_name
+from pastiche.scheduler import RequestScheduler
+from pastiche.storage import LocalBackend
+
+SIZES = [32]
+PROMPT_LATENCY = 0.05
+IMAGE_LATENCY = 2.0
+
+
+def generate_serial(out_dir_raw, games, resized_output_dir, fake, storage):
+    """The former generate_jumble_images: every stage of a game inside one of 4 thread slots"""
+    client = OpenAI(base_url=fake.base_url, api_key="fake")
+
+    def process_one_game(game):
+        request = gen.prompt_request(game.clue_sentence, game.solution_unjumbled)
+        prompt = client.chat.completions.create(**request).choices[0].message.content
+        response = client.images.generate(
+            model="gpt-image-1", prompt=prompt, size="1024x1024", quality="low", n=1
+        )
+        image_bytes = base64.b64decode(response.data[0].b64_json)
+        paths = gen.encode_game_images(
+            image_bytes, out_dir_raw / f"{game.id}.jpg", resized_output_dir, game.id
+        )
+        for path in paths:
+            storage.upload(path, f"thumbnails/{path.name}")
+
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        list(ex.map(process_one_game, games))
+
+
+def expected_blobs(n_games: int) -> set[str]:
+    blobs = set()
+    for game_id in range(1, n_games + 1):
+        blobs.add(f"thumbnails/{game_id}.jpg")
+        for width in config.IMAGE_WIDTHS:
+            for image_format in IMAGE_FORMATS:
+                blobs.add(f"thumbnails/{derivative_name(game_id, width, image_format)}")
+    return blobs
+
+
+def timed(generate, n_games: int, fake: FakeOpenAI) -> float:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        raw_dir, resized_dir = Path(tmp_dir) / "raw", Path(tmp_dir) / "resized"
+        raw_dir.mkdir()
+        resized_dir.mkdir()
+        storage = LocalBackend(Path(tmp_dir) / "bucket")
+        start = time.perf_counter()
+        generate(raw_dir, games(1, n_games), resized_dir, fake, storage)
+        elapsed = time.perf_counter() - start
+        uploaded = {
+            path.relative_to(storage.root).as_posix()
+            for path in storage.root.rglob("*")
+            if path.is_file()
+        }
+    missing = expected_blobs(n_games) - uploaded
+    if missing:
+        print(f"{len(missing)} blobs missing, e.g. {sorted(missing)[:3]}")
+        sys.exit(1)
+    return elapsed
+
+
+def generate_pipeline(out_dir_raw, games, resized_output_dir, fake, storage):
+    stats = gen.generate_jumble_images(
+        out_dir_raw,
+        games,
+        resized_output_dir,
+        client=AsyncOpenAI(base_url=fake.base_url, api_key="fake", max_retries=0),
+        prompt_scheduler=RequestScheduler(API_RPM, max_concurrency=4),
+        image_scheduler=RequestScheduler(API_RPM, max_concurrency=4),
+        storage=storage,
+        cache=GenerationCache(out_dir_raw.parent / "cache"),
+        published=PublishedDerivatives(out_dir_raw.parent / "published.json"),
+        report_interval=None,
+    )
+    assert all(stage["failed"] == 0 for stage in stats.values()), stats
+
+
+def main():
+    print(f"{'games':>8} {'serial (s)':>11} {'pipeline (s)':>13} {'speedup':>9}")
+    with FakeOpenAI(chat_latency=PROMPT_LATENCY, image_latency=IMAGE_LATENCY) as fake:
+        for n_games in SIZES:
+            serial = timed(generate_serial, n_games, fake)
+            pipeline = timed(generate_pipeline, n_games, fake)
+            print(
+                f"{n_games:>8} {serial:>11.2f} {pipeline:>13.2f} {serial / pipeline:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
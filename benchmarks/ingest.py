@@ -0,0 +1,74 @@
+"""Database ingest: ORM unit of work (former populate_database) vs bulk Core inserts (ingest.insert_games).
+
+Games are synthetic rows shaped like iter_game_rows output (see
+benchmarks.synthetic_games), so pydantic validation is left out of the
+timings.
+
+    python -m benchmarks.ingest
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from benchmarks.synthetic_games import game_rows
+from pastiche import ingest, tables
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def insert_games_orm(rows, bind) -> None:
+    with Session(bind=bind) as db:
+        jumble_games = []
+        for game, jumbles in rows:
+            jumble_game = tables.JumbleGame(
+                **game,
+                jumbles=[
+                    tables.Jumble(
+                        jumbled=t["jumbled"],
+                        unjumbled=t["unjumbled"],
+                        clue_indices=t["clue_indices"].split(","),
+                    )
+                    for t in jumbles
+                ],
+            )
+            jumble_games.append(jumble_game)
+        db.add_all(jumble_games)
+        db.commit()
+
+
+def timed_ingest(insert_fn, rows, db_path: Path) -> float:
+    bind = create_engine(f"sqlite:///{db_path}")
+    tables.Base.metadata.create_all(bind)
+    start = time.perf_counter()
+    insert_fn(rows, bind)
+    elapsed = time.perf_counter() - start
+    with bind.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(tables.Jumble)) == 4 * len(
+            rows
+        )
+    bind.dispose()
+    return elapsed
+
+
+def main():
+    print(f"{'games':>8} {'orm (s)':>9} {'bulk (s)':>9} {'speedup':>9}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_games in SIZES:
+            rows = game_rows(n_games)
+            orm = timed_ingest(
+                insert_games_orm, rows, Path(tmp_dir) / f"orm_{n_games}.db"
+            )
+            bulk = timed_ingest(
+                lambda rows, bind: ingest.insert_games(rows, bind=bind),
+                rows,
+                Path(tmp_dir) / f"bulk_{n_games}.db",
+            )
+            print(f"{n_games:>8} {orm:>9.3f} {bulk:>9.3f} {orm / bulk:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Prompt requests against a rate-limited local fake of the OpenAI API.
+
+Compares the former fixed thread pool with `_with_retry` (fixed 2**i sleeps,
+3 attempts, on top of the client's own retries) with pastiche.scheduler. The
+scheduler runs once with the right limits and once believing they are twice as
+high, in which case it relies on the 429s' Retry-After and on shrinking its
+concurrency. Reports throughput, the 429s the server sent and failed calls.
+
+    python -m benchmarks.openai_scheduler
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import APIError, AsyncOpenAI, OpenAI, RateLimitError
+
+from benchmarks.fake_openai import FakeOpenAI
+from pastiche import gen
+from pastiche.scheduler import RequestScheduler
+
+N_PROMPTS = 300
+RPM = 1200
+TPM = 120_000
+LATENCY = 0.1
+
+
+def _former_with_retry(fn, *args, attempts: int = 3, **kwargs):
+    """gen._with_retry before pastiche.scheduler"""
+    for i in range(attempts - 1):
+        try:
+            return fn(*args, **kwargs)
+        except (RateLimitError, APIError) as e:
+            if getattr(e, "code", None) == "insufficient_quota":
+                raise
+            time.sleep(2**i)
+    return fn(*args, **kwargs)
+
+
+def run_former(fake: FakeOpenAI, n_threads: int) -> int:
+    client = OpenAI(base_url=fake.base_url, api_key="fake")
+
+    def write_prompt(i: int):
+        request = gen.prompt_request(f"CLUE NUMBER {i}", f"SOLUTION {i}")
+        return _former_with_retry(client.chat.completions.create, **request)
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=n_threads) as ex:
+        for future in [ex.submit(write_prompt, i) for i in range(N_PROMPTS)]:
+            try:
+                future.result()
+            except APIError:
+                failed += 1
+    client.close()
+    return failed
+
+
+def run_scheduler(fake: FakeOpenAI, rpm: float, tpm: float) -> int:
+    async def run() -> int:
+        client = AsyncOpenAI(base_url=fake.base_url, api_key="fake", max_retries=0)
+        scheduler = RequestScheduler(rpm, tpm, max_concurrency=16)
+        results = await asyncio.gather(
+            *(
+                gen.generate_image_prompt(
+                    client, f"CLUE NUMBER {i}", f"SOLUTION {i}", scheduler=scheduler
+                )
+                for i in range(N_PROMPTS)
+            ),
+            return_exceptions=True,
+        )
+        await client.close()
+        return sum(isinstance(result, Exception) for result in results)
+
+    return asyncio.run(run())
+
+
+def main():
+    print(
+        f"{N_PROMPTS} prompts, server limits {RPM} RPM / {TPM} TPM, {LATENCY * 1e3:.0f} ms latency"
+    )
+    print(f"{'':<32} {'time (s)':>9} {'req/s':>7} {'429s':>6} {'failed':>7}")
+    variants = [
+        ("former, 4 threads", lambda fake: run_former(fake, 4)),
+        ("former, 16 threads", lambda fake: run_former(fake, 16)),
+        ("scheduler, right limits", lambda fake: run_scheduler(fake, RPM, TPM)),
+        (
+            "scheduler, limits 2x too high",
+            lambda fake: run_scheduler(fake, 2 * RPM, 2 * TPM),
+        ),
+    ]
+    for name, run in variants:
+        with FakeOpenAI(rpm=RPM, tpm=TPM, chat_latency=LATENCY) as fake:
+            start = time.perf_counter()
+            failed = run(fake)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name:<32} {elapsed:>9.2f} {(N_PROMPTS - failed) / elapsed:>7.1f}"
+                f" {fake.rate_limited:>6} {failed:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
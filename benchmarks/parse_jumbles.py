@@ -0,0 +1,179 @@
+"""JumbleAnswersSpider page parsing: former text-of-every-paragraph scan vs the marker XPath of extract_paragraphs.
+
+On every page of the fixture corpus (see benchmarks.fake_jumble_site), checks
+both return the same texts, or fail with the same exception, then times them:
+extraction alone on parsed pages, and HTML parsing plus extraction. Finally
+crawls the corpus offline with the whole Scrapy stack (redirects, crawl state,
+item pipeline) and checks the archived games against the archive's, the
+days fetched, failed and missing, and that every requested day was recorded,
+pages moved under another day's path included.
+
+Exits non-zero on any mismatch.
+
+    python -m benchmarks.parse_jumbles
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+from urllib.parse import urlparse
+
+from scrapy.crawler import CrawlerProcess
+from scrapy.http import HtmlResponse
+from scrapy.utils.project import get_project_settings
+
+from benchmarks.fake_jumble_site import FakeJumbleSite, canonical_path, load_pages
+from pastiche.config import LOCAL_GAMES_PATH, ROOT_DIR
+
+# the scrapy project isn't installed, it runs from its directory
+sys.path.insert(0, (ROOT_DIR / "jumble_scraper").as_posix())
+os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "jumble_scraper.settings")
+
+from jumble_scraper.crawl_state import CrawlState  # noqa: E402
+from jumble_scraper.spiders.jumble_spider import JumbleAnswersSpider  # noqa: E402
+
+REPEAT = 50
+# the November 2021 pages and the day after them, and the moved 2022-07-28 page
+CRAWLS = {
+    "2021": (date(2021, 11, 8), date(2021, 12, 9)),
+    "2022": (date(2022, 7, 27), date(2022, 7, 28)),
+}
+EXPECTED_SUMMARIES = {
+    "2021": {"fetched": 26, "failed": 3, "missing": 3},
+    "2022": {"fetched": 2},
+}
+
+
+def extract_paragraphs_legacy(response) -> tuple[list[str], str, str]:
+    content = ["".join(t.css("::text").extract()) for t in response.css("p")]
+
+    index_ref = content.index("CARTOON ANSWER:")
+    jumbles_text = content[:index_ref]
+    clue_sentence_text = content[index_ref + 1]
+    solution_text = content[index_ref + 2]
+    return jumbles_text, clue_sentence_text, solution_text
+
+
+def outcome(fn, response):
+    try:
+        return fn(response)
+    except (ValueError, IndexError) as e:
+        return type(e).__name__
+
+
+def time_per_page(fn, responses) -> float:
+    n_pages = 0
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for response in responses():
+            fn(response)
+            n_pages += 1
+    return (time.perf_counter() - start) / n_pages * 1e6
+
+
+def crawl(site: FakeJumbleSite, tmp_dir: Path) -> tuple[float, dict[str, Path]]:
+    process = CrawlerProcess(
+        {
+            **get_project_settings(),
+            "LOG_LEVEL": "WARNING",
+            "ROBOTSTXT_OBEY": False,
+            "RETRY_TIMES": 0,
+            # no database: only the archive is written
+            "PASTICHE_DB_PATH": (tmp_dir / "pastiche.db").as_posix(),
+            "AUTOTHROTTLE_START_DELAY": 0,
+        }
+    )
+    archive_paths = {}
+    for name, (start_date, end_date) in CRAWLS.items():
+        archive_paths[name] = tmp_dir / f"jumble_answers_{name}.json"
+        process.crawl(
+            JumbleAnswersSpider,
+            raw_url=site.base_url,
+            start_date=start_date.isoformat(),
+            end_date=end_date.isoformat(),
+            output_path=archive_paths[name].as_posix(),
+        )
+    start = time.perf_counter()
+    process.start()
+    return time.perf_counter() - start, archive_paths
+
+
+def main():
+    pages = load_pages()
+    spider = JumbleAnswersSpider.__new__(JumbleAnswersSpider)
+
+    def responses():
+        for value_date, body in pages.items():
+            yield HtmlResponse(
+                url=f"https://jumbleanswer.com{canonical_path(value_date, body)}",
+                body=body,
+                encoding="utf-8",
+            )
+
+    failures = []
+    for response in responses():
+        legacy = outcome(extract_paragraphs_legacy, response)
+        fast = outcome(spider.extract_paragraphs, response)
+        if legacy != fast:
+            failures.append(response.url)
+            print(f"MISMATCH {response.url}: {legacy!r} != {fast!r}")
+    print(f"{len(pages) - len(failures)}/{len(pages)} pages parsed the same")
+
+    parsed = list(responses())
+    for response in parsed:
+        response.selector
+    print(f"{'':<24}{'legacy (us)':>12}{'xpath (us)':>12}{'speedup':>9}")
+    for name, source in (
+        ("extract, per page", lambda: parsed),
+        ("parse+extract, per page", responses),
+    ):
+        legacy = time_per_page(lambda r: outcome(extract_paragraphs_legacy, r), source)
+        fast = time_per_page(lambda r: outcome(spider.extract_paragraphs, r), source)
+        print(f"{name:<24}{legacy:>12.0f}{fast:>12.0f}{legacy / fast:>8.1f}x")
+
+    expected = {}
+    with open(LOCAL_GAMES_PATH) as file:
+        for line in file:
+            game = json.loads(line)
+            expected[urlparse(game.pop("url_from")).path] = game
+
+    scraped, summaries, gaps = [], {}, {}
+    with tempfile.TemporaryDirectory() as tmp_dir, FakeJumbleSite(latency=0.05) as site:
+        elapsed, archive_paths = crawl(site, Path(tmp_dir))
+        for name, archive_path in archive_paths.items():
+            with open(archive_path) as file:
+                scraped += [json.loads(line) for line in file]
+            state = CrawlState(archive_path.with_suffix(".crawl_state.db"))
+            summaries[name] = state.summary()
+            # every requested day was recorded one way or another
+            gaps[name] = state.gaps(
+                *CRAWLS[name], max_attempts=1, recheck_missing_days=-1
+            )
+            state.close()
+
+    print(f"crawled {site.served} pages in {elapsed:.2f}s: {summaries}")
+    for game in scraped:
+        path = urlparse(game.pop("url_from")).path
+        if game != expected.get(path):
+            failures.append(path)
+            print(f"MISMATCH {path}: scraped game differs from the archive's")
+    n_games = sum(summary["fetched"] for summary in EXPECTED_SUMMARIES.values())
+    if len(scraped) != n_games or summaries != EXPECTED_SUMMARIES:
+        failures.append("crawl")
+        print(
+            f"FAIL expected {n_games} games and {EXPECTED_SUMMARIES}, got {len(scraped)} games"
+        )
+    for name, unrecorded in gaps.items():
+        if unrecorded:
+            failures.append(name)
+            print(f"FAIL days requested but not recorded: {unrecorded}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Number of SQL statements issued per endpoint, asserted against the expected counts.
+
+Cold requests run with the game and page caches cleared, warm ones right
+after. Exits non-zero on any mismatch, e.g. a lazy load sneaking back in.
+
+    python -m benchmarks.sql_statements
+"""
+
+import sys
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from pastiche import crud
+from pastiche.config import DISPLAY_DATE_FORMAT
+from pastiche.database import SessionLocal, engine
+from pastiche.main import app, game_cache, page_cache
+
+statements = []
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+
+def count(fn) -> int:
+    statements.clear()
+    fn()
+    return len(statements)
+
+
+def main():
+    failures = []
+
+    def check(name: str, fn, expected: int):
+        n_statements = count(fn)
+        status = "ok" if n_statements == expected else f"FAIL (expected {expected})"
+        print(f"{name:<38} {n_statements:>3} statements  {status}")
+        if n_statements != expected:
+            failures.append(name)
+
+    def clear_caches():
+        game_cache.clear()
+        page_cache.clear()
+
+    with TestClient(app) as client:
+        with SessionLocal() as db:
+            game = crud.read_first_game(db)
+            value_day = game.value_day
+        check_form = {
+            "value_date": value_day.strftime(DISPLAY_DATE_FORMAT),
+            "jumble_letters": ["A"],
+            "solution_letters": ["A"],
+        }
+
+        clear_caches()
+        check("GET /{value_date} (cold)", lambda: client.get(f"/{value_day}"), 1)
+        check("GET /{value_date} (warm)", lambda: client.get(f"/{value_day}"), 0)
+        clear_caches()
+        check("POST /check (cold)", lambda: client.post("/check", data=check_form), 1)
+        check("POST /check (warm)", lambda: client.post("/check", data=check_form), 0)
+        api_check = {
+            "game_id": game.id,
+            "submissions": [{"solution": "A", "jumbles": ["A"]}] * 3,
+        }
+        clear_caches()
+        check(
+            "POST /api/check (cold)",
+            lambda: client.post("/api/check", json=api_check),
+            1,
+        )
+        check(
+            "POST /api/check (warm)",
+            lambda: client.post("/api/check", json=api_check),
+            0,
+        )
+        check("POST /statistics", lambda: client.post("/statistics", json=[]), 0)
+
+        def read_month():
+            with SessionLocal() as db:
+                games = crud.read_jumble_games(
+                    db, start_date=value_day, end_date=value_day + timedelta(days=29)
+                )
+                assert len(games) == 30
+                for game in games:
+                    game.to_sanitized_dict()
+
+        check("crud.read_jumble_games (30 days)", read_month, 2)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Image uploads: a new client per file (former gen.upload_blob) vs pastiche.storage.GCSBackend.
+
+Runs offline against a local stand-in for the GCS JSON upload API that answers
+503 to the first attempt of every 10th object. Reports wall time, TCP
+connections opened and uploads lost (both retry the 503s, but the former
+upload_blob swallowed whatever still failed). Also times LocalBackend.
+
+Then uploads like gen.py's upload stage with the production defaults: 8
+workers each calling upload_many for a game's files, over a GCSBackend with a
+16 connection pool. Checks no more connections are opened than the pool
+holds and urllib3 never discards one for a full pool.
+
+    python -m benchmarks.storage_upload
+"""
+
+import json
+import logging
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import storage
+
+from pastiche.storage import GCSBackend, LocalBackend
+
+SIZES = [100, 400]
+FILE_SIZE = 20 * 1024  # bytes, about a 480w WebP derivative
+FAIL_EVERY = 10
+# gen.generate_jumble_images defaults: upload workers, pool size, files per game
+UPLOAD_WORKERS = 8
+POOL_SIZE = 16
+N_GAMES = 64
+FILES_PER_GAME = 6
+
+
+class FakeGCS(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), FakeGCSHandler)
+        self.objects = set()
+        self.failed_once = set()
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def reset(self) -> None:
+        self.objects.clear()
+        self.failed_once.clear()
+        self.connections = 0
+
+
+class FakeGCSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        name = json.loads(re.search(rb"\r\n\r\n(\{.*?\})\r\n", body).group(1))["name"]
+        query = parse_qs(urlparse(self.path).query)
+        server = self.server
+        with server.lock:
+            index = int(re.search(r"(\d+)", name).group(1))
+            if index % FAIL_EVERY == 0 and name not in server.failed_once:
+                server.failed_once.add(name)
+                status = 503
+            elif name in server.objects and query.get("ifGenerationMatch") == ["0"]:
+                status = 412
+            else:
+                server.objects.add(name)
+                status = 200
+        payload = json.dumps({"name": name, "bucket": "bench", "generation": "1"})
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload.encode())
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def former_upload_blob(
+    client_factory, bucket_name, source_file_name, destination_blob_name
+):
+    """gen.upload_blob before pastiche.storage"""
+    try:
+        storage_client = client_factory()
+        bucket = storage_client.bucket(bucket_name)
+        blob = bucket.blob(destination_blob_name)
+        blob.upload_from_filename(source_file_name, if_generation_match=0)
+    except Exception:
+        pass
+
+
+class _PoolFullCounter(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__(logging.WARNING)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if "Connection pool is full" in record.getMessage():
+            self.count += 1
+
+
+def upload_stage(server: FakeGCS, client_factory, tmp_dir: Path) -> bool:
+    """Upload N_GAMES games' files as gen.py's upload stage does, return whether it failed"""
+    games = []
+    for game_id in range(1, N_GAMES + 1):
+        files = []
+        for i in range(FILES_PER_GAME):
+            path = tmp_dir / f"game-{game_id}-{i}.webp"
+            path.write_bytes(bytes(FILE_SIZE))
+            files.append((path, f"thumbnails/{game_id * 100 + i}.webp"))
+        games.append(files)
+
+    server.reset()
+    pool_full = _PoolFullCounter()
+    logging.getLogger("urllib3.connectionpool").addHandler(pool_full)
+    backend = GCSBackend("bench", client_factory=client_factory, pool_size=POOL_SIZE)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as stage:
+        errors = list(stage.map(backend.upload_many, games))
+    elapsed = time.perf_counter() - start
+    backend.close()
+    logging.getLogger("urllib3.connectionpool").removeHandler(pool_full)
+
+    lost = N_GAMES * FILES_PER_GAME - len(server.objects)
+    print(
+        f"upload stage: {N_GAMES} games x {FILES_PER_GAME} files by {UPLOAD_WORKERS} workers"
+        f" over a {POOL_SIZE} connection pool in {elapsed:.2f}s: {server.connections} conns,"
+        f" {pool_full.count} discarded for a full pool, {lost} lost"
+    )
+    return (
+        any(errors) or lost > 0 or pool_full.count > 0 or server.connections > POOL_SIZE
+    )
+
+
+def main():
+    server = FakeGCS()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def client_factory():
+        return storage.Client(
+            project="bench",
+            credentials=AnonymousCredentials(),
+            client_options={"api_endpoint": f"http://127.0.0.1:{server.server_port}"},
+        )
+
+    print(
+        f"{'files':>6} {'per-file client (s)':>20} {'conns':>6} {'lost':>5}"
+        f" {'GCSBackend (s)':>15} {'conns':>6} {'lost':>5} {'LocalBackend (s)':>17}"
+    )
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_files in SIZES:
+            files = []
+            for i in range(1, n_files + 1):
+                path = Path(tmp_dir) / f"{n_files}-{i}.webp"
+                path.write_bytes(bytes(FILE_SIZE))
+                files.append((path, f"thumbnails/{i}-480w.webp"))
+
+            server.reset()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=8) as ex:
+                for path, name in files:
+                    ex.submit(former_upload_blob, client_factory, "bench", path, name)
+            former = time.perf_counter() - start
+            former_conns, former_lost = server.connections, n_files - len(
+                server.objects
+            )
+
+            server.reset()
+            backend = GCSBackend("bench", client_factory=client_factory, pool_size=8)
+            start = time.perf_counter()
+            errors = backend.upload_many(files)
+            pooled = time.perf_counter() - start
+            backend.close()
+            pooled_conns, pooled_lost = server.connections, n_files - len(
+                server.objects
+            )
+            failed |= bool(errors) or pooled_lost > 0
+
+            local = LocalBackend(Path(tmp_dir) / f"bucket-{n_files}")
+            start = time.perf_counter()
+            failed |= bool(local.upload_many(files))
+            local_time = time.perf_counter() - start
+            local.close()
+
+            print(
+                f"{n_files:>6} {former:>20.2f} {former_conns:>6} {former_lost:>5}"
+                f" {pooled:>15.2f} {pooled_conns:>6} {pooled_lost:>5} {local_time:>17.3f}"
+            )
+        failed |= upload_stage(server, client_factory, Path(tmp_dir))
+    server.shutdown()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
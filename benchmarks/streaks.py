@@ -0,0 +1,86 @@
+"""/statistics computation: former pandas resample implementation vs pastiche.streaks.
+
+Histories are random play records with gaps; both implementations must agree.
+
+    python -m benchmarks.streaks
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import groupby
+
+import pandas as pd
+
+from pastiche import streaks
+from pastiche.config import DISPLAY_DATE_FORMAT, RESET_DATE
+
+SIZES = [1, 100, 10_000, 50_000]
+
+
+def compute_statistics_pandas(value_dates: list[dict]) -> dict:
+    df = pd.DataFrame(value_dates)
+    df["valueDate"] = df["valueDate"].apply(
+        lambda x: datetime.strptime(x, DISPLAY_DATE_FORMAT)
+    )
+    fastest_time = int(df["elapsedTime"].min())
+    count_played = int(df["valueDate"].nunique())
+
+    df.set_index("valueDate", inplace=True)
+    df = df.resample("D").first()
+    df.sort_index(inplace=True)
+
+    played_dates = ~df["elapsedTime"].isnull()
+
+    consecutive_dates = []
+    for k, g in groupby(enumerate(played_dates), lambda x: x[1]):
+        if k:
+            consecutive_dates.append(list(map(lambda x: x[0], list(g))))
+
+    return {
+        "played": count_played,
+        "fastest": fastest_time,
+        "max_streak": int(max([len(t) for t in consecutive_dates])),
+        "current_streak": int([len(t) for t in consecutive_dates][-1]),
+    }
+
+
+def random_history(n_entries: int) -> list[dict]:
+    history = []
+    day = RESET_DATE
+    for _ in range(n_entries):
+        history.append(
+            {
+                "valueDate": day.strftime(DISPLAY_DATE_FORMAT),
+                "elapsedTime": random.randint(10_000, 600_000),
+            }
+        )
+        # mostly consecutive days, with the occasional gap or replay
+        day += timedelta(days=random.choice([0, 1, 1, 1, 1, 1, 2, 5]))
+    random.shuffle(history)
+    return history
+
+
+def timeit(fn, history: list[dict], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(history)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'entries':>8} {'pandas (ms)':>12} {'streaks (ms)':>13} {'speedup':>9}")
+    for n_entries in SIZES:
+        history = random_history(n_entries)
+        assert compute_statistics_pandas(history) == streaks.compute_statistics(history)
+        legacy = timeit(compute_statistics_pandas, history)
+        new = timeit(streaks.compute_statistics, history)
+        print(
+            f"{n_entries:>8} {legacy * 1e3:>12.3f} {new * 1e3:>13.3f} {legacy / new:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Synthetic games shared by the benchmarks.
+
+games() makes stand-ins for tables.JumbleGame rows, with just what gen.py
+reads. game_rows() makes jumble_games and jumbles rows shaped like the output
+of ingest.iter_game_rows, for building databases without pydantic validation.
+"""
+
+from datetime import timedelta
+from types import SimpleNamespace
+
+from pastiche import tables
+from pastiche.config import RESET_DATE
+
+# rate limits of the fake OpenAI API out of the way, only concurrency bounds the calls
+API_RPM = 6000
+
+
+def games(first: int, last: int, id_offset: int = 0, edited: int | None = None) -> list:
+    """Games first to last, with ids shifted by id_offset (as by a database rebuild) and game edited's clue changed"""
+    return [
+        SimpleNamespace(
+            id=i + id_offset,
+            clue_sentence=f"CLUE NUMBER {i}" + (" (EDITED)" if i == edited else ""),
+            solution_unjumbled=f"SOLUTION {i}",
+        )
+        for i in range(first, last + 1)
+    ]
+
+
+def game_rows(n_games: int) -> list[tuple[dict, list[dict]]]:
+    """n_games days of the same game from RESET_DATE, each with its 4 jumbles"""
+    rows = []
+    for i in range(n_games):
+        value_date = RESET_DATE + timedelta(days=i)
+        game = {
+            "url_from": f"https://example.com/{i}",
+            "value_date": value_date,
+            "value_day": value_date.date(),
+            "solution": "DAYINDAYOUT",
+            "solution_unjumbled": "DAY IN (AND) DAY OUT",
+            "solution_jumbled": "DDY TI AUA ONY",
+            "clue_sentence": "YOU CAN LOOK TO THE EAST TO SEE THE SUN RISE",
+            "sanitized_solution": "*** ** (AND) *** ***",
+        }
+        jumbles = [
+            {
+                "jumbled": jumbled,
+                "unjumbled": unjumbled,
+                "clue_indices": tables.Jumble.encode_clue_indices(clue_indices),
+                "clue_mask": tables.Jumble.encode_clue_mask(clue_indices),
+            }
+            for jumbled, unjumbled, clue_indices in [
+                ("DMYUD", "MUDDY", [2, 4, 3, 1]),
+                ("ZTYIZ", "TIZZY", [1, 4, 0]),
+                ("UTLACA", "ACTUAL", [0, 1]),
+                ("RYEONR", "ORNERY", [0, 2]),
+            ]
+        ]
+        rows.append((game, jumbles))
+    return rows
@@ -0,0 +1,136 @@
+"""Crawl state of JumbleAnswersSpider: which dates were fetched, failed or missing from the site.
+
+A SQLite sidecar of the JSONL archive, indexed by date, so the spider finds
+the gaps of the whole history without re-reading the archive and resumes an
+interrupted crawl where it stopped: each outcome is committed as it is
+recorded. Created from the archive the first time.
+"""
+
+import json
+import sqlite3
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+FETCHED = "fetched"
+FAILED = "failed"
+MISSING = "missing"
+
+
+class CrawlState:
+    def __init__(
+        self, path: str | Path, archive_path: str | Path | None = None
+    ) -> None:
+        self.path = Path(path)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS crawl_state (
+                    value_date TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    updated_at TEXT NOT NULL
+                )
+                """)
+        if archive_path is not None and self.count() == 0:
+            self.import_archive(archive_path)
+
+    def count(self) -> int:
+        return self.connection.execute("SELECT count(*) FROM crawl_state").fetchone()[0]
+
+    def import_archive(self, archive_path: str | Path) -> int:
+        """Mark the dates already in the JSONL archive as fetched, return how many"""
+        try:
+            with open(archive_path) as file:
+                value_dates = [
+                    json.loads(line)["value_date"] for line in file if line.strip()
+                ]
+        except FileNotFoundError:
+            return 0
+        now = datetime.utcnow().isoformat()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO crawl_state (value_date, status, attempts, updated_at)"
+                " VALUES (?, ?, 1, ?)",
+                [(value_date, FETCHED, now) for value_date in value_dates],
+            )
+        return len(value_dates)
+
+    def record(self, value_date: date, status: str, error: str | None = None) -> None:
+        self.record_many([value_date], status, error)
+
+    def record_many(
+        self, value_dates: list[date], status: str, error: str | None = None
+    ) -> None:
+        """Record the same outcome for several dates, in one transaction"""
+        now = datetime.utcnow().isoformat()
+        with self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO crawl_state (value_date, status, attempts, error, updated_at)
+                VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT (value_date) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = attempts + 1,
+                    error = excluded.error,
+                    updated_at = excluded.updated_at
+                """,
+                [
+                    (value_date.isoformat(), status, error, now)
+                    for value_date in value_dates
+                ],
+            )
+
+    def first_date(self) -> date | None:
+        value_date = self.connection.execute(
+            "SELECT min(value_date) FROM crawl_state"
+        ).fetchone()[0]
+        return date.fromisoformat(value_date) if value_date else None
+
+    def gaps(
+        self,
+        start_date: date,
+        end_date: date,
+        max_attempts: int = 3,
+        recheck_missing_days: int = 7,
+    ) -> list[date]:
+        """Dates between start_date and end_date (included) still to fetch, latest first.
+
+        That is dates never crawled, failed ones with attempts left, and
+        missing ones within recheck_missing_days of end_date, in case the site
+        published them late.
+        """
+        rows = self.connection.execute(
+            "SELECT value_date, status, attempts FROM crawl_state"
+            " WHERE value_date BETWEEN ? AND ?",
+            (start_date.isoformat(), end_date.isoformat()),
+        )
+        known = {
+            value_date: (status, attempts) for value_date, status, attempts in rows
+        }
+        recheck_from = end_date - timedelta(days=recheck_missing_days)
+
+        gaps = []
+        value_date = end_date
+        while value_date >= start_date:
+            status, attempts = known.get(value_date.isoformat(), (None, 0))
+            if (
+                status is None
+                or (status == FAILED and attempts < max_attempts)
+                or (status == MISSING and value_date >= recheck_from)
+            ):
+                gaps.append(value_date)
+            value_date -= timedelta(days=1)
+        return gaps
+
+    def summary(self) -> dict[str, int]:
+        return dict(
+            self.connection.execute(
+                "SELECT status, count(*) FROM crawl_state GROUP BY status"
+            ).fetchall()
+        )
+
+    def close(self) -> None:
+        self.connection.close()
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, computed_field
+from pydantic import BaseModel, Field, computed_field
 from urllib.parse import urlparse
-from datetime import datetime
+from datetime import date, datetime
 
 
 class JumbleAnswerItem(BaseModel):
@@ -14,6 +14,8 @@ class JumbleGameAnswerItem(BaseModel):
     solution_jumbled: str
     solution_unjumbled: str
     jumbles: list[JumbleAnswerItem]
+    # date the spider requested, value_date is the one of the page it was redirected to
+    requested_date: date | None = Field(default=None, exclude=True)
 
     class Config:
         arbitrary_types_allowed = True
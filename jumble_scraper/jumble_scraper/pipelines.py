@@ -1,13 +1,126 @@
-# Define your item pipelines here
-#
-# Don't forget to add your pipeline to the ITEM_PIPELINES setting
-# See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
+"""Item pipeline of JumbleAnswersSpider: validated games go to the JSONL archive and straight into the pastiche database.
 
+Items are validated with pastiche.game.JumbleGame and buffered. Each batch is
+appended to the archive in one write, then upserted into the database in one
+transaction (see pastiche.ingest.upsert_games), with the day payloads of its
+games refreshed and the database fingerprint extended with the appended lines
+(its hash is chained over the archive's lines). So a daily scrape costs
+O(new games), and the app starts on the updated database instead of
+rebuilding it from the whole history.
 
-# useful for handling different item types with a single interface
-from itemadapter import ItemAdapter
+Only a database that was in sync with the archive is updated; a missing or
+stale one is left to the app's rebuild (pastiche.ingest.check_and_populate_db).
+Dates are recorded as fetched in the crawl state once their batch is stored,
+so an interrupted crawl refetches what it hadn't stored yet. They are the
+dates the spider requested, not the games' value_date: a few pages sit under
+the previous day's path (e.g. 2022-07-28 under /2022/07/27/), and recording
+those would leave the requested date a gap to refetch on every crawl.
+"""
+
+import json
+from datetime import date
+from pathlib import Path
+
+from scrapy.exceptions import DropItem
+
+from jumble_scraper.crawl_state import FAILED, FETCHED
 
 
 class JumbleScraperPipeline:
+    def __init__(self, db_path: str | None = None, batch_size: int = 50) -> None:
+        self.db_path = db_path
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            db_path=crawler.settings.get("PASTICHE_DB_PATH"),
+            batch_size=crawler.settings.getint("INGEST_BATCH_SIZE", 50),
+        )
+
+    def open_spider(self, spider) -> None:
+        # imported here so the scraper settings load without the app's dependencies
+        from pastiche.config import LOCAL_DB_PATH
+        from pastiche.database import create_db_engine
+        from pastiche.ingest import matches_source_size, read_fingerprint
+
+        self.archive_path = Path(spider.output_path)
+        self.buffer = []
+        self.engine = None
+        self.fingerprint = None
+
+        db_path = self.db_path or LOCAL_DB_PATH
+        if not Path(db_path).exists() or not self.archive_path.exists():
+            spider.logger.warning(
+                f"No database at {db_path} (or no archive), games are only archived"
+            )
+            return
+        engine = create_db_engine(db_path, mode="read_write")
+        fingerprint = read_fingerprint(bind=engine)
+        # the app checks the whole archive's hash at startup, the size is enough here
+        if not matches_source_size(fingerprint, self.archive_path):
+            spider.logger.warning(
+                f"Database at {db_path} is out of date with {self.archive_path}, games are only archived"
+                " and the app will rebuild it"
+            )
+            engine.dispose()
+            return
+        self.engine = engine
+        self.fingerprint = fingerprint
+
     def process_item(self, item, spider):
+        from pastiche.game import JumbleGame
+
+        data = item.model_dump()
+        requested_date = item.requested_date or date.fromisoformat(data["value_date"])
+        try:
+            game = JumbleGame.from_dict(data)
+        except Exception as e:
+            spider.crawl_state.record(
+                requested_date,
+                FAILED,
+                error=f"{type(e).__name__}: {e}",
+            )
+            raise DropItem(f"Invalid game at {data['url_from']}: {e}")
+
+        self.buffer.append((data, game, requested_date))
+        if len(self.buffer) >= self.batch_size:
+            self.flush(spider)
         return item
+
+    def flush(self, spider) -> None:
+        if not self.buffer:
+            return
+        from pastiche.ingest import (
+            extend_fingerprint,
+            refresh_daily_payloads,
+            upsert_games,
+            write_fingerprint,
+        )
+
+        batch, self.buffer = self.buffer, []
+        # archive first: should the database write fail, its fingerprint no
+        # longer matches and the app rebuilds it from the archive
+        appended = "".join(json.dumps(data) + "\n" for data, _, _ in batch).encode()
+        with open(self.archive_path, "ab") as file:
+            file.write(appended)
+
+        if self.engine is not None:
+            game_ids = upsert_games([game for _, game, _ in batch], bind=self.engine)
+            refresh_daily_payloads(game_ids=game_ids, bind=self.engine)
+            # only the appended lines are hashed
+            self.fingerprint = extend_fingerprint(self.fingerprint, appended)
+            write_fingerprint(self.fingerprint, bind=self.engine)
+
+        spider.crawl_state.record_many(
+            [requested_date for _, _, requested_date in batch], FETCHED
+        )
+        spider.logger.info(
+            f"Stored {len(batch)} games"
+            + (" (archive and database)" if self.engine is not None else " (archive)")
+        )
+
+    def close_spider(self, spider) -> None:
+        self.flush(spider)
+        if self.engine is not None:
+            self.engine.dispose()
@@ -1,8 +1,9 @@
-import json
 from datetime import datetime, timedelta, date
+from pathlib import Path
 from typing import Any
 import scrapy
 
+from jumble_scraper.crawl_state import FAILED, MISSING, CrawlState
 from jumble_scraper.items import (
     JumbleGameAnswerItem,
     JumbleAnswerItem,
@@ -11,6 +12,14 @@ from jumble_scraper.items import (
 
 class JumbleAnswersSpider(scrapy.Spider):
     name: str = "jumble_answers_spider"
+    # text of the paragraph between the jumbles and the clue sentence
+    answer_marker: str = "CARTOON ANSWER:"
+    # gaps of the whole history can be hundreds of pages, fetch them concurrently but politely
+    custom_settings = {
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 8,
+        "AUTOTHROTTLE_ENABLED": True,
+        "AUTOTHROTTLE_TARGET_CONCURRENCY": 4.0,
+    }
 
     def __init__(
         self,
@@ -21,6 +30,9 @@ class JumbleAnswersSpider(scrapy.Spider):
         output_path: str = "../../../data/jumble_answers_data.json",
         force_update: bool = False,
         date_format: str = "%Y-%m-%d",
+        start_date: str | date | None = None,
+        state_path: str | None = None,
+        max_attempts: int = 3,
         *args,
         **kwargs: Any,
     ):
@@ -28,7 +40,9 @@ class JumbleAnswersSpider(scrapy.Spider):
 
         self.date_format = date_format
         if isinstance(end_date, str):
-            end_date = date.strptime(end_date, self.date_format)
+            end_date = datetime.strptime(end_date, self.date_format).date()
+        if isinstance(start_date, str):
+            start_date = datetime.strptime(start_date, self.date_format).date()
 
         self.end_date = end_date
         self.date_offset = int(date_offset)
@@ -39,24 +53,36 @@ class JumbleAnswersSpider(scrapy.Spider):
         self.raw_url = raw_url
         self.answers_endpoint_prefix = answers_endpoint_prefix
         self.output_path = output_path
-        self.visited_dates = self.load_value_dates_from_json()
+        self.max_attempts = int(max_attempts)
+        self.crawl_state = CrawlState(
+            state_path or Path(output_path).with_suffix(".crawl_state.db"),
+            archive_path=output_path,
+        )
+        # the last date_offset days: all of them refetched when forcing an update,
+        # otherwise the gaps from there back to the start of the crawled history
+        window_start = self.end_date - timedelta(days=self.date_offset - 1)
+        if start_date is not None:
+            self.start_date = start_date
+        elif self.force_update:
+            self.start_date = window_start
+        else:
+            self.start_date = min(
+                self.crawl_state.first_date() or window_start, window_start
+            )
 
         self.value_dates = self.get_value_dates()
 
         self.logger.info(
-            f"Init. new spider with {len(self.value_dates)} dates to scrap (end_date={self.end_date} | force_update={self.force_update})"
+            f"Init. new spider with {len(self.value_dates)} dates to scrap ({self.start_date} to end_date={self.end_date} | force_update={self.force_update} | state={self.crawl_state.summary()})"
         )
 
-    def get_value_dates(self) -> list[datetime]:
-        value_dates = []
-        for i in range(self.date_offset):
-            value_date = self.end_date - timedelta(days=i)
-            if (
-                value_date.strftime(self.date_format) not in self.visited_dates
-                or self.force_update
-            ):
-                value_dates.append(value_date)
-        return value_dates
+    def get_value_dates(self) -> list[date]:
+        if self.force_update:
+            n_days = (self.end_date - self.start_date).days + 1
+            return [self.end_date - timedelta(days=i) for i in range(n_days)]
+        return self.crawl_state.gaps(
+            self.start_date, self.end_date, max_attempts=self.max_attempts
+        )
 
     def parse(self, response):
         pass
@@ -68,15 +94,63 @@ class JumbleAnswersSpider(scrapy.Spider):
             day = value_date.day
             date_str = f"{month}-{day}-{value_date.strftime('%y')}"
             url = f"{self.raw_url}/{year}/{str(month).zfill(2)}/{str(day).zfill(2)}/{self.answers_endpoint_prefix}-{date_str}"
-            yield scrapy.Request(url, callback=self.parse_jumbles)
+            yield scrapy.Request(
+                url,
+                callback=self.parse_jumbles,
+                errback=self.record_failure,
+                meta={"value_date": value_date, "handle_httpstatus_list": [404]},
+            )
 
     def parse_jumbles(self, response):
-        content = ["".join(t.css("::text").extract()) for t in response.css("p")]
+        value_date = response.meta["value_date"]
+        if response.status == 404:
+            self.crawl_state.record(value_date, MISSING)
+            return
+        try:
+            jumble_game = self.extract_jumble_game(response)
+        except (ValueError, IndexError) as e:
+            # e.g. no "CARTOON ANSWER:" paragraph, or a line without "="
+            self.crawl_state.record(value_date, FAILED, error=f"parse error: {e}")
+            self.logger.warning(f"Failed to parse {response.url}: {e}")
+            return
+        # archived, ingested and recorded as fetched by the item pipeline, under
+        # the requested date: some pages sit under another day's path
+        jumble_game.requested_date = value_date
+        yield jumble_game
+
+    def record_failure(self, failure):
+        self.crawl_state.record(
+            failure.request.meta["value_date"], FAILED, error=repr(failure.value)
+        )
+
+    def closed(self, reason):
+        self.logger.info(f"Crawl state: {self.crawl_state.summary()}")
+        self.crawl_state.close()
 
-        index_ref = content.index("CARTOON ANSWER:")
-        jumbles_text = content[:index_ref]
-        clue_sentence_text = content[index_ref + 1]
-        solution_text = content[index_ref + 2]
+    def extract_paragraphs(self, response) -> tuple[list[str], str, str]:
+        """Texts of the paragraphs before the answer marker (the jumbles) and of the two after it (clue sentence and solution).
+        Only reads these, not every paragraph of the page's comments, sidebar and footer
+        """
+        marker = response.xpath(
+            "(//p[string() = $marker])[1]", marker=self.answer_marker
+        )
+        if not marker:
+            raise ValueError(f"{self.answer_marker!r} paragraph not found")
+        jumbles_text = marker.xpath("preceding::p").xpath("string()").getall()
+        following = (
+            marker.xpath("following::p[position() <= 2]").xpath("string()").getall()
+        )
+        if len(following) < 2:
+            raise IndexError(
+                f"missing clue sentence or solution after {self.answer_marker!r}"
+            )
+        clue_sentence_text, solution_text = following
+        return jumbles_text, clue_sentence_text, solution_text
+
+    def extract_jumble_game(self, response) -> JumbleGameAnswerItem:
+        jumbles_text, clue_sentence_text, solution_text = self.extract_paragraphs(
+            response
+        )
 
         # parse jumbles
         jumbles = []
@@ -91,24 +165,10 @@ class JumbleAnswersSpider(scrapy.Spider):
             t.strip() for t in solution_text.split("=")
         ]
 
-        jumble_game = JumbleGameAnswerItem(
+        return JumbleGameAnswerItem(
             url_from=response.url,
             clue_sentence=clue_sentence_text.strip(),
             solution_jumbled=jumbled_solution,
             solution_unjumbled=unjumbled_solution,
             jumbles=jumbles,
         )
-        self.save_to_json(jumble_game.model_dump())
-
-    def load_value_dates_from_json(self) -> list[str]:
-        try:
-            with open(self.output_path) as file:
-                visited_dates = [json.loads(line)["value_date"] for line in file]
-                return visited_dates
-        except FileNotFoundError:
-            return []
-
-    def save_to_json(self, data) -> None:
-        with open(self.output_path, "a") as file:
-            json.dump(data, file)
-            file.write("\n")
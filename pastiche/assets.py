@@ -0,0 +1,173 @@
+"""Static assets: content hashes for versioned URLs, precompressed variants and serving them.
+
+`python -m pastiche.assets` runs at build time. It writes the hashes to a
+manifest and .gz (and .br when brotli is installed) variants next to the
+compressible files, so startup only has to stat the files instead of hashing
+them. Files changed since the manifest was written (e.g. while developing) are
+hashed at startup, and their stale variants are not served.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import stat
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from pastiche.config import STATIC_DIRECTORY, STATIC_MANIFEST_PATH
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+COMPRESSIBLE_SUFFIXES = {".js", ".css", ".html", ".svg", ".json", ".txt"}
+# preferred first
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _is_variant(path: Path) -> bool:
+    return path.suffix in ENCODINGS.values()
+
+
+def _iter_static_files(static_dir: str):
+    for path in sorted(Path(static_dir).rglob("*")):
+        if path.is_file() and not _is_variant(path):
+            yield path
+
+
+def _hash_file(path: Path) -> str:
+    return hashlib.md5(path.read_bytes()).hexdigest()[:10]
+
+
+def build_manifest(static_dir: str = STATIC_DIRECTORY) -> dict[str, dict]:
+    manifest = {}
+    for path in _iter_static_files(static_dir):
+        stat_result = path.stat()
+        manifest[path.relative_to(static_dir).as_posix()] = {
+            "hash": _hash_file(path),
+            "size": stat_result.st_size,
+            "mtime_ns": stat_result.st_mtime_ns,
+        }
+    return manifest
+
+
+def write_precompressed(static_dir: str = STATIC_DIRECTORY) -> list[Path]:
+    """Writes the .gz/.br variants of the compressible static files, returns the variants written"""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        logger.info("brotli is not installed, only writing gzip variants")
+
+    written = []
+    for path in _iter_static_files(static_dir):
+        if path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        data = path.read_bytes()
+        variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(data, quality=11)
+        for suffix, compressed in variants.items():
+            variant_path = path.with_name(path.name + suffix)
+            variant_path.write_bytes(compressed)
+            written.append(variant_path)
+    return written
+
+
+def load_static_hashes(
+    static_dir: str = STATIC_DIRECTORY, manifest_path: Path = STATIC_MANIFEST_PATH
+) -> dict[str, str]:
+    """Content hash of each static file, from the build manifest when the file is unchanged since, hashed otherwise"""
+    try:
+        manifest = json.loads(Path(manifest_path).read_text())
+    except FileNotFoundError:
+        manifest = {}
+
+    hashes = {}
+    for path in _iter_static_files(static_dir):
+        rel = path.relative_to(static_dir).as_posix()
+        entry = manifest.get(rel)
+        stat_result = path.stat()
+        if (
+            entry is not None
+            and entry["size"] == stat_result.st_size
+            and entry["mtime_ns"] == stat_result.st_mtime_ns
+        ):
+            hashes[rel] = entry["hash"]
+        else:
+            hashes[rel] = _hash_file(path)
+    return hashes
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles serving the precompressed variant accepted by the client when one is up to date,
+    with immutable caching for URLs versioned with the file's current hash"""
+
+    def __init__(self, *args, hashes: dict[str, str] | None = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.hashes = hashes or {}
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = None
+        if scope["method"] in ("GET", "HEAD") and Path(path).suffix in (
+            COMPRESSIBLE_SUFFIXES
+        ):
+            response = await self._precompressed_response(path, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        if Path(path).suffix in COMPRESSIBLE_SUFFIXES:
+            response.headers["Vary"] = "Accept-Encoding"
+        version = parse_qs(scope.get("query_string", b"").decode()).get("v")
+        if version and version[0] == self.hashes.get(path.replace(os.sep, "/")):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    async def _precompressed_response(self, path: str, scope: Scope) -> Response | None:
+        request_headers = Headers(scope=scope)
+        accepted = {
+            t.split(";")[0].strip()
+            for t in request_headers.get("accept-encoding", "").split(",")
+        }
+        for encoding, suffix in ENCODINGS.items():
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(
+                self.lookup_path, path + suffix
+            )
+            if not (stat_result and stat.S_ISREG(stat_result.st_mode)):
+                continue
+            _, source_stat = await anyio.to_thread.run_sync(self.lookup_path, path)
+            if source_stat is None or source_stat.st_mtime_ns > stat_result.st_mtime_ns:
+                # source edited after the variant was built
+                continue
+            response = FileResponse(
+                full_path,
+                stat_result=stat_result,
+                method=scope["method"],
+                media_type=mimetypes.guess_type(path)[0],
+                headers={"Content-Encoding": encoding},
+            )
+            if self.is_not_modified(response.headers, request_headers):
+                return NotModifiedResponse(response.headers)
+            return response
+        return None
+
+
+if __name__ == "__main__":
+    manifest = build_manifest()
+    Path(STATIC_MANIFEST_PATH).write_text(json.dumps(manifest, indent=2))
+    variants = write_precompressed()
+    logger.info(
+        f"Wrote manifest of {len(manifest)} static files and {len(variants)} precompressed variants"
+    )
@@ -0,0 +1,292 @@
+"""Batch mode for gen.py: prompt and image requests submitted as JSONL job files instead of live calls.
+
+Backfilling hundreds of days through a provider's batch interface costs less
+and doesn't eat into the live rate limits. run_batch writes the requests that
+the generation cache can't answer, submits them, polls until they are done
+and ingests the results into the cache. gen.generate_jumble_images then
+encodes and publishes the images, without any live call for what the batches
+returned. Submitted batches are recorded in the work directory, so an
+interrupted run resumes polling them instead of paying for them again.
+
+Providers implement BatchProvider: OpenAIBatchProvider for the OpenAI Batch
+API, benchmarks.fake_openai.FakeBatchProvider for offline runs.
+"""
+
+import argparse
+import base64
+import datetime as dt
+import json
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from openai import OpenAI
+
+from pastiche import config, crud, gen
+from pastiche.database import SessionLocal
+from pastiche.generation_cache import GenerationCache
+from pastiche.utils import write_json_atomic
+
+CHAT_ENDPOINT = "/v1/chat/completions"
+IMAGES_ENDPOINT = "/v1/images/generations"
+
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchProvider(ABC):
+    # endpoints the provider takes batches for, the others are called live
+    endpoints: frozenset[str] = frozenset()
+
+    @abstractmethod
+    def submit(self, jobs_path: Path, endpoint: str) -> str:
+        """Submit a JSONL job file of requests to endpoint, return the batch id"""
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """Status of the batch, in TERMINAL_STATUSES once it is done"""
+
+    @abstractmethod
+    def download(self, batch_id: str, results_path: Path) -> None:
+        """Write the batch's results (and errors), in the JSONL batch output format, to results_path"""
+
+
+class OpenAIBatchProvider(BatchProvider):
+    endpoints = frozenset({CHAT_ENDPOINT})
+
+    def __init__(
+        self, client: OpenAI | None = None, endpoints: frozenset[str] | None = None
+    ) -> None:
+        self.client = client or OpenAI()
+        if endpoints is not None:
+            self.endpoints = endpoints
+
+    def submit(self, jobs_path: Path, endpoint: str) -> str:
+        with open(jobs_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id, endpoint=endpoint, completion_window="24h"
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def download(self, batch_id: str, results_path: Path) -> None:
+        batch = self.client.batches.retrieve(batch_id)
+        with open(results_path, "w") as f:
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id is not None:
+                    # line by line: a file may not end with a newline
+                    for line in self.client.files.content(file_id).text.splitlines():
+                        f.write(line + "\n")
+
+
+def write_jobs(jobs_path: Path, endpoint: str, bodies: dict[str, dict]) -> None:
+    """One JSONL request per custom id, in the batch input format"""
+    with open(jobs_path, "w") as f:
+        for custom_id, body in bodies.items():
+            line = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": endpoint,
+                "body": body,
+            }
+            f.write(json.dumps(line) + "\n")
+
+
+def read_results(results_path: Path) -> tuple[dict[str, dict], dict[str, str]]:
+    """Response bodies and errors, by custom id, from a batch output file"""
+    bodies, errors = {}, {}
+    with open(results_path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if result.get("error") is None and response.get("status_code") == 200:
+                bodies[result["custom_id"]] = response["body"]
+            else:
+                errors[result["custom_id"]] = str(
+                    result.get("error") or response.get("body")
+                )
+    return bodies, errors
+
+
+def wait_for_batch(
+    provider: BatchProvider, batch_id: str, poll_interval: float = 60
+) -> str:
+    last_status = None
+    while (status := provider.status(batch_id)) not in TERMINAL_STATUSES:
+        if status != last_status:
+            print(f"batch {batch_id}: {status}")
+            last_status = status
+        time.sleep(poll_interval)
+    print(f"batch {batch_id}: {status}")
+    return status
+
+
+class _BatchState:
+    """Batches submitted and not yet ingested, by endpoint, persisted in the work directory"""
+
+    def __init__(self, work_dir: Path) -> None:
+        self.path = work_dir / "batches.json"
+        try:
+            self.batches = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            self.batches = {}
+
+    def get(self, endpoint: str) -> str | None:
+        return self.batches.get(endpoint)
+
+    def set(self, endpoint: str, batch_id: str | None) -> None:
+        if batch_id is None:
+            self.batches.pop(endpoint, None)
+        else:
+            self.batches[endpoint] = batch_id
+        write_json_atomic(self.path, self.batches, indent=2)
+
+
+def _run_phase(
+    provider: BatchProvider,
+    endpoint: str,
+    bodies: dict[str, dict],
+    ingest,
+    work_dir: Path,
+    state: _BatchState,
+    poll_interval: float,
+) -> int:
+    """Submit (or resume) the endpoint's batch and ingest its results, return the number ingested"""
+    batch_id = state.get(endpoint)
+    if batch_id is None:
+        if not bodies:
+            return 0
+        jobs_path = work_dir / f"{endpoint.strip('/').replace('/', '-')}.jobs.jsonl"
+        write_jobs(jobs_path, endpoint, bodies)
+        batch_id = provider.submit(jobs_path, endpoint)
+        state.set(endpoint, batch_id)
+        print(f"submitted batch {batch_id} of {len(bodies)} requests to {endpoint}")
+    else:
+        print(f"resuming batch {batch_id} to {endpoint}")
+
+    status = wait_for_batch(provider, batch_id, poll_interval)
+    ingested = 0
+    if status == "completed":
+        results_path = work_dir / f"{batch_id}.results.jsonl"
+        provider.download(batch_id, results_path)
+        results, errors = read_results(results_path)
+        for custom_id, body in results.items():
+            ingest(custom_id, body)
+        ingested = len(results)
+        for custom_id, error in errors.items():
+            print(f"request {custom_id} of batch {batch_id} failed: {error}")
+    state.set(endpoint, None)
+    return ingested
+
+
+def run_batch(
+    games: list,
+    out_dir_raw: Path,
+    resized_output_dir: Path,
+    provider: BatchProvider,
+    work_dir: Path,
+    cache: GenerationCache | None = None,
+    poll_interval: float = 60,
+    **generate_kwargs,
+) -> dict[str, dict]:
+    """Generate the games' prompts and images through batches, then encode and publish them.
+
+    Requests to endpoints the provider can't batch, and whatever a batch
+    failed to return, are made live by gen.generate_jumble_images, which gets
+    generate_kwargs. Returns its stats.
+    """
+    work_dir.mkdir(parents=True, exist_ok=True)
+    cache = cache or GenerationCache()
+    state = _BatchState(work_dir)
+
+    keys = {}
+    for game in games:
+        prompt_key = gen.prompt_cache_key(game.clue_sentence, game.solution_unjumbled)
+        image_key = gen.image_cache_key(prompt_key)
+        if cache.output(game.id) != image_key and not cache.has_image(image_key):
+            keys[prompt_key] = (game, image_key)
+
+    if CHAT_ENDPOINT in provider.endpoints:
+        prompt_bodies = {
+            prompt_key: gen.prompt_request(game.clue_sentence, game.solution_unjumbled)
+            for prompt_key, (game, _) in keys.items()
+            if cache.get_prompt(prompt_key) is None
+        }
+
+        def ingest_prompt(prompt_key: str, body: dict) -> None:
+            cache.put_prompt(prompt_key, body["choices"][0]["message"]["content"])
+
+        _run_phase(
+            provider,
+            CHAT_ENDPOINT,
+            prompt_bodies,
+            ingest_prompt,
+            work_dir,
+            state,
+            poll_interval,
+        )
+
+    if IMAGES_ENDPOINT in provider.endpoints:
+        image_bodies = {
+            image_key: {
+                "model": gen.IMAGE_MODEL,
+                "prompt": cache.get_prompt(prompt_key),
+                "size": gen.IMAGE_SIZE,
+                "quality": gen.IMAGE_QUALITY,
+                "n": 1,
+            }
+            for prompt_key, (_, image_key) in keys.items()
+            if cache.get_prompt(prompt_key) is not None
+        }
+
+        def ingest_image(image_key: str, body: dict) -> None:
+            cache.put_image(image_key, base64.b64decode(body["data"][0]["b64_json"]))
+
+        _run_phase(
+            provider,
+            IMAGES_ENDPOINT,
+            image_bodies,
+            ingest_image,
+            work_dir,
+            state,
+            poll_interval,
+        )
+
+    return gen.generate_jumble_images(
+        out_dir_raw, games, resized_output_dir, cache=cache, **generate_kwargs
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Backfill the jumble game images through the OpenAI Batch API"
+    )
+    parser.add_argument(
+        "--start-date", type=dt.date.fromisoformat, default=config.RESET_DATE.date()
+    )
+    parser.add_argument("--end-date", type=dt.date.fromisoformat, default=None)
+    parser.add_argument(
+        "--poll-interval", type=float, default=60, help="seconds between status checks"
+    )
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        games = crud.read_jumble_games(
+            db, start_date=args.start_date, end_date=args.end_date
+        )
+    output_dir = config.DATA_DIR / "images/v1"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    resized_output_dir = config.DATA_DIR / "images/thumbnails"
+    resized_output_dir.mkdir(exist_ok=True)
+    run_batch(
+        games,
+        output_dir,
+        resized_output_dir,
+        OpenAIBatchProvider(),
+        work_dir=config.DATA_DIR / "images/batches",
+        poll_interval=args.poll_interval,
+    )
@@ -0,0 +1,237 @@
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import date
+from types import MappingProxyType
+from typing import Any, Callable, Hashable, Mapping
+
+from pastiche import tables
+
+
+@dataclass(frozen=True)
+class GameSnapshot:
+    """Immutable, session-free copy of a game: the sanitized payload sent to the page plus the answers used by /check"""
+
+    id: int
+    value_day: date
+    payload: Mapping[str, Any]
+    solution: str
+    answers: tuple[str, ...]
+    # digests of the solution and answers, compared in constant time by check()
+    solution_digest: bytes = field(init=False, repr=False)
+    answer_digests: tuple[bytes, ...] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "solution_digest", _digest(self.solution))
+        object.__setattr__(
+            self, "answer_digests", tuple(_digest(t) for t in self.answers)
+        )
+
+    def check(self, solution: str, jumbles: list[str]) -> dict[str, Any]:
+        """Checks a submitted solution and unjumbled words (in jumble order, missing ones count as wrong)"""
+        jumbles_correct = {}
+        for i, answer_digest in enumerate(self.answer_digests):
+            submitted = jumbles[i] if i < len(jumbles) else ""
+            jumbles_correct[i + 1] = hmac.compare_digest(
+                _digest(submitted), answer_digest
+            )
+        return {
+            "is_correct": hmac.compare_digest(_digest(solution), self.solution_digest),
+            "is_jumbles_correct": jumbles_correct,
+        }
+
+    @classmethod
+    def from_daily_payload(cls, daily_payload: tables.DailyPayload) -> "GameSnapshot":
+        payload = json.loads(daily_payload.payload)
+        payload["jumbles"] = tuple(MappingProxyType(t) for t in payload["jumbles"])
+        answers = json.loads(daily_payload.answers)
+        return cls(
+            id=daily_payload.jumble_game_id,
+            value_day=daily_payload.value_day,
+            payload=MappingProxyType(payload),
+            solution=answers["solution"],
+            answers=tuple(answers["jumbles"]),
+        )
+
+
+def _digest(value: str) -> bytes:
+    return hashlib.sha256(value.encode()).digest()
+
+
+class GameCache:
+    """Bounded LRU cache of game snapshots keyed by date.
+
+    Entries expire after `ttl` seconds (never if None). Concurrent misses for
+    the same key are coalesced so only one caller runs the loader, the others
+    wait for its result. Loaders returning None (no game) are not cached.
+    """
+
+    def __init__(self, maxsize: int = 32, ttl: float | None = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, GameSnapshot]] = OrderedDict()
+        self._in_flight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def get_cached(self, key: Hashable) -> GameSnapshot | None:
+        """Returns the snapshot if it is cached and fresh, without ever loading it (counts hits only)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._is_expired(entry):
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def get(
+        self, key: Hashable, loader: Callable[[], GameSnapshot | None]
+    ) -> GameSnapshot | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._is_expired(entry):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            future = self._in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            snapshot = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            if snapshot is not None:
+                self._store(key, snapshot)
+        future.set_result(snapshot)
+        return snapshot
+
+    def put_if_absent(self, key: Hashable, snapshot: GameSnapshot) -> GameSnapshot:
+        """Caches snapshot unless a fresh one is already cached, returns the cached one.
+        Never waits on a load in flight for key, so it is safe to call from the event loop
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._is_expired(entry):
+                self._entries.move_to_end(key)
+                return entry[1]
+            self._store(key, snapshot)
+        return snapshot
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
+
+    def _store(self, key: Hashable, snapshot: GameSnapshot) -> None:
+        # called with the lock held
+        self._entries[key] = (time.monotonic(), snapshot)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _is_expired(self, entry: tuple[float, GameSnapshot]) -> bool:
+        return self.ttl is not None and time.monotonic() - entry[0] > self.ttl
+
+
+@dataclass(frozen=True)
+class RenderedPage:
+    """Rendered response body with its strong ETag, along with the snapshot it was rendered from"""
+
+    body: bytes
+    etag: str
+    snapshot: GameSnapshot
+
+    @classmethod
+    def from_body(cls, body: bytes, snapshot: GameSnapshot) -> "RenderedPage":
+        return cls(
+            body=body,
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            snapshot=snapshot,
+        )
+
+    def matches(self, if_none_match: str | None) -> bool:
+        """Whether an If-None-Match header value matches this page's ETag"""
+        if not if_none_match:
+            return False
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or self.etag in tags
+
+
+class PageCache:
+    """Bounded LRU cache of rendered pages.
+
+    Keys are expected to include everything the output depends on besides the
+    game itself (template and static assets hashes). A page is re-rendered when
+    the game snapshot it was built from has been replaced in the GameCache.
+    """
+
+    def __init__(self, maxsize: int = 32) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, RenderedPage] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        key: Hashable,
+        snapshot: GameSnapshot,
+        render: Callable[[GameSnapshot], bytes],
+    ) -> RenderedPage:
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None and page.snapshot is snapshot:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return page
+            self.misses += 1
+
+        page = RenderedPage.from_body(render(snapshot), snapshot)
+        with self._lock:
+            self._entries[key] = page
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return page
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from datetime import datetime
 
@@ -12,13 +13,61 @@ LOCAL_GAMES_PATH = DATA_DIR / "jumble_answers_data.json"
 
 STATIC_DIRECTORY = (ROOT_DIR / "static").as_posix()
 TEMPLATES_DIRECTORY = (ROOT_DIR / "templates").as_posix()
+# static files hashes, written at build time by pastiche.assets
+STATIC_MANIFEST_PATH = ROOT_DIR / "static-manifest.json"
 
 DISPLAY_DATE_FORMAT = "%A, %B %d %Y"
 
 SANITIZE_SUB = "*"
 
-BASE_IMAGE_URL = "https://storage.googleapis.com/pastiche-images/thumbnails"
-
 BUCKET_IMG = "pastiche-images"
 
+# where game images are uploaded and served from (see pastiche.storage): the
+# "gcs" bucket, or a "local" directory the app serves under LOCAL_IMAGE_URL
+IMAGE_STORAGE = os.getenv("PASTICHE_IMAGE_STORAGE", "gcs")
+LOCAL_IMAGE_DIRECTORY = DATA_DIR / "images/served"
+LOCAL_IMAGE_URL = "/images"
+
+BASE_IMAGE_URL = (
+    f"{LOCAL_IMAGE_URL}/thumbnails"
+    if IMAGE_STORAGE == "local"
+    else f"https://storage.googleapis.com/{BUCKET_IMG}/thumbnails"
+)
+
 RESET_DATE = datetime(2023, 11, 8)
+
+# in-process cache of daily game snapshots (see pastiche.cache)
+GAME_CACHE_SIZE = 32
+GAME_CACHE_TTL = 60 * 60  # seconds
+
+# rendered daily pages, revalidated by browsers/CDN through their ETag
+PAGE_CACHE_SIZE = 32
+PAGE_CACHE_CONTROL = "public, max-age=300, must-revalidate"
+
+# threads running blocking database calls for the async handlers
+DB_EXECUTOR_WORKERS = 8
+
+# "serve": read-only, immutable and mmap'd database for the web app (the image's
+# database is never written at runtime), "read_write": WAL journal for ingest
+DB_MODE = os.getenv("PASTICHE_DB_MODE", "read_write")
+DB_MMAP_SIZE = 256 * 1024 * 1024  # bytes
+DB_CACHE_SIZE = -64 * 1024  # negative: KiB, as in PRAGMA cache_size
+
+# generated prompts and images, by content (see pastiche.generation_cache)
+GENERATION_CACHE_DIRECTORY = DATA_DIR / "images/cache"
+
+# responsive derivatives of each game image (see pastiche.images)
+IMAGE_WIDTHS = (320, 480, 640, 960)
+# ids of the games whose derivatives were uploaded, the only ones the page offers them for
+PUBLISHED_DERIVATIVES_PATH = (
+    LOCAL_IMAGE_DIRECTORY / "published_derivatives.json"
+    if IMAGE_STORAGE == "local"
+    else DATA_DIR / "published_derivatives.json"
+)
+IMAGE_WEBP_QUALITY = 72
+IMAGE_JPEG_QUALITY = 78
+
+# OpenAI rate limits of the account's tier, paced by pastiche.scheduler
+OPENAI_PROMPT_RPM = 500
+OPENAI_PROMPT_TPM = 200_000
+OPENAI_IMAGE_RPM = 5  # images per minute
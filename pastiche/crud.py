@@ -1,6 +1,5 @@
-from datetime import datetime
-from sqlalchemy.orm import Session
-from sqlalchemy import extract
+from datetime import date, datetime
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from pastiche import tables
 
@@ -9,13 +8,52 @@ def read_first_game(db: Session) -> tables.JumbleGame:
     return db.query(tables.JumbleGame).first()
 
 
-def read_jumble_game(db: Session, value_date: datetime) -> tables.JumbleGame | None:
+def read_jumble_game(
+    db: Session, value_date: date | datetime
+) -> tables.JumbleGame | None:
+    """Reads the game played on value_date, with its jumbles loaded in the same statement"""
+    if isinstance(value_date, datetime):
+        value_date = value_date.date()
     return (
         db.query(tables.JumbleGame)
-        .filter(
-            extract("year", tables.JumbleGame.value_date) == value_date.year,
-            extract("month", tables.JumbleGame.value_date) == value_date.month,
-            extract("day", tables.JumbleGame.value_date) == value_date.day,
-        )
+        .options(joinedload(tables.JumbleGame.jumbles))
+        .filter(tables.JumbleGame.value_day == value_date)
+        .first()
+    )
+
+
+def read_jumble_games(
+    db: Session,
+    start_date: date,
+    end_date: date | None = None,
+    limit: int | None = None,
+) -> list[tables.JumbleGame]:
+    """Reads the games played from start_date to end_date (inclusive) ordered by date,
+    with all their jumbles loaded in a single extra statement"""
+    query = (
+        db.query(tables.JumbleGame)
+        .options(selectinload(tables.JumbleGame.jumbles))
+        .filter(tables.JumbleGame.value_day >= start_date)
+    )
+    if end_date is not None:
+        query = query.filter(tables.JumbleGame.value_day <= end_date)
+    return query.order_by(tables.JumbleGame.value_day).limit(limit).all()
+
+
+def read_daily_payload(
+    db: Session, value_date: date | datetime
+) -> tables.DailyPayload | None:
+    """Reads the pre-serialized payload of the game played on value_date, a primary key lookup"""
+    if isinstance(value_date, datetime):
+        value_date = value_date.date()
+    return db.get(tables.DailyPayload, value_date)
+
+
+def read_daily_payload_by_game_id(
+    db: Session, game_id: int
+) -> tables.DailyPayload | None:
+    return (
+        db.query(tables.DailyPayload)
+        .filter(tables.DailyPayload.jumble_game_id == game_id)
         .first()
     )
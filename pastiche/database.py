@@ -1,71 +1,68 @@
-from pathlib import Path
-import logging
-from datetime import datetime, timedelta
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import OperationalError, NoResultFound, ProgrammingError
-
-from pastiche.game import JumbleGameCollection
-from pastiche import tables
-from pastiche.config import LOCAL_DB_PATH, RESET_DATE
-
-DB_URL = f"sqlite:///{LOCAL_DB_PATH}"
-engine = create_engine(DB_URL)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-
-
-def create_tables(drop_if_exists: True):
-    """Helper to create all tables defined under pastiche.tables. If db exists, drop and recreate new ones"""
-    if drop_if_exists:
-        tables.Base.metadata.drop_all(engine)
-    # create tables
-    tables.Base.metadata.create_all(engine)
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, TypeVar
 
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.orm import sessionmaker
 
-def populate_database(path: str | Path, reset_dates: bool = True) -> None:
-    """Populates database with historical jumble games"""
+from pastiche.config import (
+    DB_CACHE_SIZE,
+    DB_EXECUTOR_WORKERS,
+    DB_MMAP_SIZE,
+    DB_MODE,
+    LOCAL_DB_PATH,
+)
+
+DB_MODES = ("serve", "read_write")
+
+
+def create_db_engine(path: str = LOCAL_DB_PATH, mode: str = DB_MODE) -> Engine:
+    """Creates an engine on the SQLite database at path, tuned for mode:
+    - serve: read-only and immutable (no locking or change detection), memory-mapped with a larger page cache,
+      with a connection per database thread
+    - read_write: WAL journal with synchronous=NORMAL, for ingest
+    """
+    if mode == "serve":
+        pragmas = [
+            f"PRAGMA mmap_size={DB_MMAP_SIZE}",
+            f"PRAGMA cache_size={DB_CACHE_SIZE}",
+            "PRAGMA query_only=ON",
+        ]
+        db_engine = create_engine(
+            f"sqlite:///file:{path}?mode=ro&immutable=1&uri=true",
+            pool_size=DB_EXECUTOR_WORKERS,
+            max_overflow=0,
+        )
+    elif mode == "read_write":
+        pragmas = ["PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL"]
+        db_engine = create_engine(f"sqlite:///{path}")
+    else:
+        raise ValueError(f"Unknown database mode {mode!r}, expected one of {DB_MODES}")
 
-    historical_games = JumbleGameCollection.from_jumble_answers(path)
+    @event.listens_for(db_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
 
-    with SessionLocal() as db:
-        jumble_games = []
-        for i, game in enumerate(historical_games.games):
-            game_dict = game.model_dump()
-            jumbles_list = game_dict.pop("jumbles")
-            jumbles = [tables.Jumble(**t) for t in jumbles_list]
-            if reset_dates:
-                game_dict["value_date"] = RESET_DATE + timedelta(days=i)
-            jumble_game = tables.JumbleGame(**game_dict, jumbles=jumbles)
-            jumble_games.append(jumble_game)
+    return db_engine
 
-        db.add_all(jumble_games)
-        db.commit()
 
+engine = create_db_engine()
 
-def check_and_populate_db(path: str | Path) -> None:
-    """Check if the database exists and is populated, if not, create tables and populate database"""
-    try:
-        # try to get the first record from the table
-        with SessionLocal() as db:
-            record = db.query(tables.JumbleGame).first()
-            if record is None:
-                raise NoResultFound
-    except (NoResultFound, OperationalError, ProgrammingError):
-        # if the table does not exist or is empty, create tables and populate database
-        logger.info(
-            "Database is not created or not populated. Creating tables and populating database..."
-        )
-        create_tables(drop_if_exists=True)
-        populate_database(path)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-    logger.info("Database is ready (＾◡＾)っ✂╰⋃╯")
+# dedicated threads for blocking database calls made from async handlers
+db_executor = ThreadPoolExecutor(
+    max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="pastiche-db"
+)
 
+T = TypeVar("T")
 
-if __name__ == "__main__":
-    from pastiche.config import LOCAL_GAMES_PATH
 
-    check_and_populate_db(LOCAL_GAMES_PATH)
+async def run_in_db_executor(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Runs a blocking database call in the database thread pool so it doesn't block the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(fn, *args, **kwargs))
@@ -1,9 +1,17 @@
+import json
+import logging
 import re
-import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterator, NamedTuple
 from pydantic import BaseModel, Field, field_validator, computed_field, ValidationError
 from datetime import datetime
 from tqdm import tqdm
 
+logger = logging.getLogger(__name__)
+
 WORD_LIST = {"A", "AN", "FOR", "HER", "HIS", "IN", "IT", "THE", "THEIR", "TO", "WAS"}
 
 
@@ -108,35 +116,33 @@ class JumbleGame(BaseModel):
 
     @staticmethod
     def find_indices(solution: str, jumbles: list[Jumble]):
-        # Convert the solution word to a list so we can manipulate it
-        solution_letters = list(solution)
+        """Assigns each solution letter to the first unused position of that letter in the first jumble having one.
+        Positions of a letter are used from left to right, so a cursor per jumble and letter replaces the used list
+        """
+        # equal jumbles share their state, as they share their key in the returned dict
+        slot_by_jumble = {}
+        slots = [slot_by_jumble.setdefault(t, len(slot_by_jumble)) for t in jumbles]
+        words = [jumble.unjumbled for jumble in slot_by_jumble]
+
+        # next position to search from, for each letter of each jumble
+        cursors = [{} for _ in slot_by_jumble]
 
         # This will store the indices for each letter found
-        letter_indices = {word: [] for word in jumbles}
-
-        # This will keep track of used letters so we don't reuse them
-        used_indices = {word: [] for word in jumbles}
-
-        for s_letter in solution_letters:
-            found = False
-            for jumble in jumbles:
-                for i, w_letter in enumerate(jumble.unjumbled):
-                    if s_letter == w_letter and i not in used_indices[jumble]:
-                        # If the letter in the solution word matches the letter in the word
-                        # And it has not been used yet, add the index to the list
-                        letter_indices[jumble].append(i)
-                        used_indices[jumble].append(i)
-                        found = True
-                        break  # Break the inner loop and go to the next letter in the solution word
-                if found:
-                    break  # Break the outer loop since we've found our letter
-
-            if not found:
+        indices = [[] for _ in slot_by_jumble]
+
+        for s_letter in solution:
+            for slot in slots:
+                i = words[slot].find(s_letter, cursors[slot].get(s_letter, 0))
+                if i >= 0:
+                    indices[slot].append(i)
+                    cursors[slot][s_letter] = i + 1
+                    break
+            else:
                 raise ValueError(
                     f"Letter {s_letter} not found in any word of the initial list."
                 )
 
-        return letter_indices
+        return {jumble: indices[slot] for jumble, slot in slot_by_jumble.items()}
 
     def set_clue_indices(self) -> None:
         for jumble, indices in self.find_indices().items():
@@ -150,8 +156,8 @@ class JumbleGame(BaseModel):
         return substring
 
     @classmethod
-    def from_row(cls, row: pd.Series) -> "JumbleGame":
-        data = row.to_dict()
+    def from_dict(cls, data: dict[str, Any]) -> "JumbleGame":
+        data = dict(data)
         data["jumbles"] = [Jumble(**t) for t in data["jumbles"]]
         try:
             return cls(**data)
@@ -163,16 +169,67 @@ class JumbleGame(BaseModel):
             return cls(**data)
 
 
+class LineError(NamedTuple):
+    line_number: int
+    error: str
+
+
+def _validate_lines(lines: list[tuple[int, str]]) -> list[JumbleGame | LineError]:
+    """Validates (line_number, line) pairs into games, catching per-line failures. Runs in pool workers"""
+    results = []
+    for line_number, line in lines:
+        try:
+            result = JumbleGame.from_dict(json.loads(line))
+        except Exception as e:
+            result = LineError(line_number, f"{type(e).__name__}: {e}")
+        results.append(result)
+    return results
+
+
 class JumbleGameCollection:
-    def __init__(self, games: list[JumbleGame]) -> None:
+    def __init__(
+        self, games: list[JumbleGame], errors: list[LineError] | None = None
+    ) -> None:
         self.games = games
+        self.errors = errors or []
+
+    @staticmethod
+    def iter_jumble_answers(
+        path: str | Path, processes: int | None = None, chunk_size: int = 64
+    ) -> Iterator[JumbleGame | LineError]:
+        """Streams the games of a jumble answers JSONL file in file order, yielding a LineError for each invalid line.
+        With processes > 1, chunks of lines are validated in a process pool, with at most 2 chunks per process in flight
+        """
+        with open(path) as file:
+            lines = ((i, line) for i, line in enumerate(file, start=1) if line.strip())
+            chunks = iter(lambda: list(islice(lines, chunk_size)), [])
+
+            if not processes or processes <= 1:
+                for chunk in chunks:
+                    for result in _validate_lines(chunk):
+                        yield result
+                return
+
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(_validate_lines, chunk))
+                    if len(pending) >= 2 * processes:
+                        for result in pending.popleft().result():
+                            yield result
+                while pending:
+                    for result in pending.popleft().result():
+                        yield result
 
     @classmethod
-    def from_jumble_answers(cls, path: str) -> "JumbleGameCollection":
-        df = pd.read_json(path, lines=True)
-        return JumbleGameCollection(
-            games=[
-                JumbleGame.from_row(row)
-                for _, row in tqdm(df.iterrows(), total=len(df))
-            ]
-        )
+    def from_jumble_answers(
+        cls, path: str | Path, processes: int | None = None
+    ) -> "JumbleGameCollection":
+        games, errors = [], []
+        for result in tqdm(cls.iter_jumble_answers(path, processes=processes)):
+            if isinstance(result, LineError):
+                logger.warning(f"skipping line {result.line_number}: {result.error}")
+                errors.append(result)
+            else:
+                games.append(result)
+        return JumbleGameCollection(games=games, errors=errors)
@@ -1,19 +1,27 @@
+import argparse
 import base64
+import hashlib
+import json
+import multiprocessing
+import os
 import sys
-import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from io import BytesIO
 from pathlib import Path
 import datetime as dt
 
-from google.cloud import storage
-from openai import OpenAI, APIError, RateLimitError
+from openai import AsyncOpenAI
 from PIL import Image
 from tqdm import tqdm
 
-from pastiche import config, tables
+from pastiche import config, crud, tables
 from pastiche.database import SessionLocal
-
+from pastiche.generation_cache import GenerationCache, content_key
+from pastiche.images import IMAGE_FORMATS, PublishedDerivatives, derivative_name
+from pastiche.pipeline import Pipeline, Stage
+from pastiche.scheduler import LoopThread, RequestScheduler
+from pastiche.storage import StorageBackend, get_backend
 
 # Locked visual style so the whole gallery looks like one coherent product.
 # "no text, no letters" is critical for a jumble game — prevents the model
@@ -32,124 +40,288 @@ Rules:
 - Always end with this exact style anchor: "{STYLE_ANCHOR}"
 - Output only the prompt itself — nothing else."""
 
+# a 2-3 sentence prompt, for the token rate limit estimates
+PROMPT_MAX_OUTPUT_TOKENS = 200
 
-def generate_image_prompt(
-    client: OpenAI, clue_sentence: str, solution: str, model: str = "gpt-4o-mini"
-) -> str | None:
-    chat_completion = client.chat.completions.create(
-        model=model,
-        messages=[
+PROMPT_MODEL = "gpt-4o-mini"
+IMAGE_MODEL = "gpt-image-1"
+IMAGE_QUALITY = "low"
+IMAGE_SIZE = "1024x1024"
+
+
+def prompt_request(
+    clue_sentence: str, solution: str, model: str = PROMPT_MODEL
+) -> dict:
+    """Body of the chat completion request writing a game's image prompt"""
+    return {
+        "model": model,
+        "messages": [
             {"role": "system", "content": PROMPT_SYSTEM},
             {"role": "user", "content": f"Clue: {clue_sentence}\nSolution: {solution}"},
         ],
+    }
+
+
+def estimate_prompt_tokens(request: dict) -> int:
+    """Rough token cost of a prompt request (~4 characters a token), settled with the actual usage"""
+    characters = sum(len(message["content"]) for message in request["messages"])
+    return characters // 4 + PROMPT_MAX_OUTPUT_TOKENS
+
+
+def prompt_cache_key(
+    clue_sentence: str, solution: str, model: str = PROMPT_MODEL
+) -> str:
+    return content_key(
+        clue_sentence=clue_sentence,
+        solution=solution,
+        model=model,
+        system=PROMPT_SYSTEM,
+        style=STYLE_ANCHOR,
     )
+
+
+def image_cache_key(
+    prompt_key: str,
+    model: str = IMAGE_MODEL,
+    quality: str = IMAGE_QUALITY,
+    size: str = IMAGE_SIZE,
+) -> str:
+    """Key of the image drawn from the prompt cached under prompt_key"""
+    return content_key(prompt=prompt_key, model=model, quality=quality, size=size)
+
+
+def _total_tokens(chat_completion) -> int | None:
+    usage = getattr(chat_completion, "usage", None)
+    return usage.total_tokens if usage is not None else None
+
+
+async def generate_image_prompt(
+    client: AsyncOpenAI,
+    clue_sentence: str,
+    solution: str,
+    model: str = PROMPT_MODEL,
+    scheduler: RequestScheduler | None = None,
+) -> str | None:
+    request = prompt_request(clue_sentence, solution, model)
+    if scheduler is None:
+        chat_completion = await client.chat.completions.create(**request)
+    else:
+        chat_completion = await scheduler.submit(
+            client.chat.completions.create,
+            tokens=estimate_prompt_tokens(request),
+            usage=_total_tokens,
+            **request,
+        )
     return chat_completion.choices[0].message.content
 
 
-def generate_image(
-    client: OpenAI,
+async def generate_image(
+    client: AsyncOpenAI,
     prompt: str,
-    model: str = "gpt-image-1",
-    quality: str = "low",
-    size: str = "1024x1024",
+    model: str = IMAGE_MODEL,
+    quality: str = IMAGE_QUALITY,
+    size: str = IMAGE_SIZE,
+    scheduler: RequestScheduler | None = None,
 ) -> bytes:
     """Generate an image and return raw PNG bytes.
 
     Defaults to gpt-image-1 at low quality — ~3-4x cheaper than dall-e-3
     standard, and more than sufficient once thumbnailed down to 400px.
     """
-    response = client.images.generate(
-        model=model,
-        prompt=prompt,
-        size=size,
-        quality=quality,
-        n=1,
-    )
+    request = {
+        "model": model,
+        "prompt": prompt,
+        "size": size,
+        "quality": quality,
+        "n": 1,
+    }
+    if scheduler is None:
+        response = await client.images.generate(**request)
+    else:
+        response = await scheduler.submit(client.images.generate, **request)
     return base64.b64decode(response.data[0].b64_json)
 
 
-def _with_retry(fn, *args, attempts: int = 3, **kwargs):
-    """Simple exponential backoff for transient OpenAI errors.
+def encode_game_images(
+    image_bytes: bytes, image_path: Path, resized_output_dir: Path, game_id: int
+) -> list[Path]:
+    """Save the generated image, its thumbnail and responsive derivatives, return the files to upload.
 
-    Only retries on truly transient errors (rate limits, 5xx). Billing
-    errors like `insufficient_quota` fail fast since retrying won't help.
+    CPU bound, runs in a process pool.
     """
-    for i in range(attempts - 1):
-        try:
-            return fn(*args, **kwargs)
-        except (RateLimitError, APIError) as e:
-            code = getattr(e, "code", None)
-            if code == "insufficient_quota":
-                raise
-            time.sleep(2**i)
-            print(f"retrying after error: {e}")
-    # Final attempt — let any exception propagate.
-    return fn(*args, **kwargs)
-
-
-def _process_one_game(
-    game: tables.JumbleGame,
-    client: OpenAI,
-    out_dir_raw: Path,
-    resized_output_dir: Path,
-    bucket_name: str,
-) -> None:
-    image_path = out_dir_raw / f"{game.id}.jpg"
-    if image_path.is_file():
-        return
-
-    image_prompt = _with_retry(
-        generate_image_prompt, client, game.clue_sentence, game.solution_unjumbled
-    )
-    if image_prompt is None:
-        print("Failed to generate prompt for game, skipping ...", game.id)
-        return
-
-    image_bytes = _with_retry(generate_image, client, image_prompt)
-
     # gpt-image-1 returns PNG; re-encode as JPEG to keep existing .jpg paths
     # and shrink file size before the thumbnail step.
     with Image.open(BytesIO(image_bytes)) as im:
         im.convert("RGB").save(image_path, "JPEG", quality=90)
 
-    thumbnail_path = resized_output_dir / f"{game.id}.jpg"
+    thumbnail_path = resized_output_dir / f"{game_id}.jpg"
     generate_thumbnail(image_path, thumbnail_path)
-
-    upload_blob(
-        bucket_name=bucket_name,
-        source_file_name=thumbnail_path,
-        destination_blob_name=f"thumbnails/{game.id}.jpg",
+    return [thumbnail_path] + generate_derivatives(
+        image_path, resized_output_dir, game_id
     )
 
 
+@dataclass
+class ImageJob:
+    """A game making its way through the image pipeline"""
+
+    game_id: int
+    clue_sentence: str
+    solution: str
+    prompt_key: str
+    image_key: str
+    prompt: str | None = None
+    image_bytes: bytes | None = None
+    paths: list[Path] = field(default_factory=list)
+
+
 def generate_jumble_images(
     out_dir_raw: Path,
     games: list[tables.JumbleGame],
     resized_output_dir: Path,
-    bucket_name: str = config.BUCKET_IMG,
-    max_workers: int = 4,
-):
-    """Generate images for the given jumble games, in parallel."""
-    client = OpenAI()
-
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        futures = {
-            ex.submit(
-                _process_one_game,
-                game,
-                client,
-                out_dir_raw,
-                resized_output_dir,
-                bucket_name,
-            ): game
-            for game in games
-        }
-        for future in tqdm(as_completed(futures), total=len(futures)):
-            game = futures[future]
-            try:
-                future.result()
-            except Exception as e:
-                print(f"failed for game {game.id}: {e}")
+    storage: StorageBackend | None = None,
+    prompt_scheduler: RequestScheduler | None = None,
+    image_scheduler: RequestScheduler | None = None,
+    processes: int | None = None,
+    upload_workers: int = 8,
+    queue_size: int = 8,
+    client: AsyncOpenAI | None = None,
+    cache: GenerationCache | None = None,
+    report_interval: float | None = 30,
+    published: PublishedDerivatives | None = None,
+) -> dict[str, dict]:
+    """Generate images for the given jumble games, return the stats of each pipeline stage and scheduler.
+
+    Prompts, images, encoding and uploads are separate stages, each with its
+    own concurrency and a bounded queue in front of it. Encoding runs in a
+    process pool. API calls are paced and retried by the schedulers, which
+    default to the configured OpenAI rate limits; they must not have been
+    used on another event loop. client, storage, cache and published default
+    to OpenAI, the configured storage backend, the generation cache and the
+    configured record of published derivatives.
+
+    Prompts and images come from the cache when their inputs are unchanged,
+    and games whose published files were made from their current image are
+    skipped, so a rerun over unchanged games makes no API call at all.
+    """
+    own_storage = storage is None
+    # game ids get reassigned by database rebuilds, replace what they pointed at
+    storage = storage or get_backend(overwrite=True)
+    cache = cache or GenerationCache()
+    published = published or PublishedDerivatives()
+    prompt_scheduler = prompt_scheduler or RequestScheduler(
+        config.OPENAI_PROMPT_RPM, config.OPENAI_PROMPT_TPM, max_concurrency=8
+    )
+    image_scheduler = image_scheduler or RequestScheduler(
+        config.OPENAI_IMAGE_RPM, max_concurrency=4
+    )
+    jobs = []
+    for game in games:
+        prompt_key = prompt_cache_key(game.clue_sentence, game.solution_unjumbled)
+        image_key = image_cache_key(prompt_key)
+        if (
+            cache.output(game.id) == image_key
+            and (out_dir_raw / f"{game.id}.jpg").is_file()
+        ):
+            continue
+        jobs.append(
+            ImageJob(
+                game.id,
+                game.clue_sentence,
+                game.solution_unjumbled,
+                prompt_key,
+                image_key,
+            )
+        )
+    # no client needed (nor an API key) when the cache has all the images
+    own_client = client is None and not all(
+        cache.has_image(job.image_key) for job in jobs
+    )
+    if own_client:
+        # retries are the schedulers'
+        client = AsyncOpenAI(max_retries=0)
+
+    def write_prompt(job: ImageJob) -> ImageJob | None:
+        if cache.has_image(job.image_key):
+            return job
+        job.prompt = cache.get_prompt(job.prompt_key)
+        if job.prompt is not None:
+            return job
+        job.prompt = api_loop.run(
+            generate_image_prompt(
+                client, job.clue_sentence, job.solution, scheduler=prompt_scheduler
+            )
+        )
+        if job.prompt is None:
+            print("Failed to generate prompt for game, skipping ...", job.game_id)
+            return None
+        cache.put_prompt(job.prompt_key, job.prompt)
+        return job
+
+    def draw_image(job: ImageJob) -> ImageJob:
+        job.image_bytes = cache.get_image(job.image_key)
+        if job.image_bytes is None:
+            job.image_bytes = api_loop.run(
+                generate_image(client, job.prompt, scheduler=image_scheduler)
+            )
+            cache.put_image(job.image_key, job.image_bytes)
+        return job
+
+    def encode(job: ImageJob) -> ImageJob:
+        job.paths = encode_pool.submit(
+            encode_game_images,
+            job.image_bytes,
+            out_dir_raw / f"{job.game_id}.jpg",
+            resized_output_dir,
+            job.game_id,
+        ).result()
+        job.image_bytes = None
+        return job
+
+    def upload_all(job: ImageJob) -> ImageJob:
+        published.discard(job.game_id)
+        _upload_thumbnails(storage, job.paths)
+        published.add(job.game_id)
+        cache.set_output(job.game_id, job.image_key)
+        return job
+
+    def on_error(stage: Stage, job: ImageJob, e: Exception) -> None:
+        print(f"{stage.name} failed for game {job.game_id}: {e}")
+
+    processes = processes or os.cpu_count()
+    # spawn: the pool starts its workers from the pipeline threads, forking there is unsafe
+    with LoopThread() as api_loop, ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+    ) as encode_pool:
+        pipeline = Pipeline(
+            [
+                # as many threads as calls the schedulers may let through at once
+                Stage("prompt", write_prompt, prompt_scheduler.max_concurrency),
+                Stage("image", draw_image, image_scheduler.max_concurrency),
+                # one thread per process keeps the pool busy without queueing inside it
+                Stage("encode", encode, processes),
+                # games whose files are uploading, the backend's pool bounds the uploads
+                Stage("upload", upload_all, upload_workers),
+            ],
+            queue_size=queue_size,
+            report_interval=report_interval,
+            on_error=on_error,
+        )
+        try:
+            pipeline.run(jobs)
+        finally:
+            if own_client:
+                api_loop.run(client.close())
+            if own_storage:
+                storage.close()
+    print(pipeline.report())
+    print(f"prompt requests: {prompt_scheduler.stats()}")
+    print(f"image requests: {image_scheduler.stats()}")
+    return {
+        **pipeline.stats(),
+        "prompt_requests": prompt_scheduler.stats(),
+        "image_requests": image_scheduler.stats(),
+    }
 
 
 def generate_thumbnail(source_path: Path, destination_path: Path, height: float = 400):
@@ -162,37 +334,159 @@ def generate_thumbnail(source_path: Path, destination_path: Path, height: float
         print(f"cannot create thumbnail for {source_path}")
 
 
-def upload_blob(bucket_name, source_file_name, destination_blob_name):
-    """Uploads a file to the bucket."""
-    try:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(destination_blob_name)
+def _upload_thumbnails(storage: StorageBackend, paths: list[Path]) -> None:
+    errors = storage.upload_many((path, f"thumbnails/{path.name}") for path in paths)
+    if errors:
+        raise RuntimeError(
+            f"failed to upload {sorted(errors)}: {next(iter(errors.values()))}"
+        )
 
-        generation_match_precondition = 0
 
-        blob.upload_from_filename(
-            source_file_name, if_generation_match=generation_match_precondition
+def generate_derivatives(
+    source_path: Path, output_dir: Path, game_id: int, widths=config.IMAGE_WIDTHS
+) -> list[Path]:
+    """Write the WebP and progressive JPEG derivatives of an image at each width, without metadata"""
+    written = []
+    with Image.open(source_path) as im:
+        im = im.convert("RGB")
+        # drop EXIF/ICC/comments carried over from the source
+        im.info.clear()
+        for width in widths:
+            if width < im.width:
+                resized = im.resize(
+                    (width, round(im.height * width / im.width)),
+                    Image.Resampling.LANCZOS,
+                )
+            else:
+                # never upscale, the srcset entry just gets the source size
+                resized = im
+            for image_format in IMAGE_FORMATS:
+                path = output_dir / derivative_name(game_id, width, image_format)
+                if image_format == "webp":
+                    resized.save(
+                        path, "WEBP", quality=config.IMAGE_WEBP_QUALITY, method=6
+                    )
+                else:
+                    resized.save(
+                        path,
+                        "JPEG",
+                        quality=config.IMAGE_JPEG_QUALITY,
+                        optimize=True,
+                        progressive=True,
+                    )
+                written.append(path)
+    return written
+
+
+def _derivatives_digest(source_path: Path) -> str:
+    """Hash of the source image and of the encoding settings it was derived with"""
+    settings = (
+        config.IMAGE_WIDTHS,
+        config.IMAGE_WEBP_QUALITY,
+        config.IMAGE_JPEG_QUALITY,
+    )
+    digest = hashlib.sha256(source_path.read_bytes())
+    digest.update(repr(settings).encode())
+    return digest.hexdigest()
+
+
+def regenerate_derivatives(
+    source_dir: Path,
+    output_dir: Path,
+    manifest_path: Path | None = None,
+    processes: int | None = None,
+    storage: StorageBackend | None = None,
+    published: PublishedDerivatives | None = None,
+) -> int:
+    """(Re)generate the derivatives of every image in source_dir, return the number of images encoded.
+
+    Images whose content (and the encoding settings) are unchanged since the
+    last run, per the manifest, are skipped. Uploads the new derivatives when
+    a storage backend is given, recording them in published (by default the
+    configured record of published derivatives).
+    """
+    if storage is not None:
+        published = published or PublishedDerivatives()
+    manifest_path = manifest_path or output_dir / "derivatives.json"
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except FileNotFoundError:
+        manifest = {}
+
+    todo = []
+    for source_path in sorted(source_dir.glob("*.jpg")):
+        game_id = int(source_path.stem)
+        digest = _derivatives_digest(source_path)
+        up_to_date = manifest.get(source_path.name) == digest and all(
+            (output_dir / derivative_name(game_id, width, image_format)).is_file()
+            for width in config.IMAGE_WIDTHS
+            for image_format in IMAGE_FORMATS
         )
+        if not up_to_date:
+            todo.append((source_path, game_id, digest))
+    print(f"{len(todo)} images to encode, {len(manifest)} in manifest")
 
-        print(f"File {source_file_name} uploaded to {destination_blob_name}.")
-    except Exception as e:
-        print(f"failed to upload {source_file_name} with error={e}")
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {
+                pool.submit(generate_derivatives, source_path, output_dir, game_id): (
+                    source_path,
+                    digest,
+                )
+                for source_path, game_id, digest in todo
+            }
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                source_path, digest = futures[future]
+                try:
+                    paths = future.result()
+                except Exception as e:
+                    print(f"failed for {source_path}: {e}")
+                    continue
+                if storage is not None:
+                    game_id = int(source_path.stem)
+                    published.discard(game_id)
+                    try:
+                        _upload_thumbnails(storage, paths)
+                    except RuntimeError as e:
+                        print(e)
+                        continue
+                    published.add(game_id)
+                manifest[source_path.name] = digest
+    finally:
+        # keep the progress of an interrupted run
+        manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return len(todo)
 
 
 if __name__ == "__main__":
-    # load X games
-    with SessionLocal() as db:
-        solutions = (
-            db.query(tables.JumbleGame)
-            .where(tables.JumbleGame.value_date >= (dt.date.today() - dt.timedelta(days=1)))
-            .order_by(tables.JumbleGame.value_date)
-            .limit(60)
-            .all()
-        )
+    parser = argparse.ArgumentParser(description="Generate the jumble game images")
+    parser.add_argument(
+        "--derivatives",
+        action="store_true",
+        help="only regenerate the responsive derivatives of the existing images",
+    )
+    parser.add_argument(
+        "--upload", action="store_true", help="upload regenerated derivatives"
+    )
+    args = parser.parse_args()
+
     output_dir = config.DATA_DIR / "images/v1"
-    output_dir.mkdir(exist_ok=True)
+    output_dir.mkdir(parents=True, exist_ok=True)
     resized_output_dir = config.DATA_DIR / "images/thumbnails"
     resized_output_dir.mkdir(exist_ok=True)
+
+    if args.derivatives:
+        regenerate_derivatives(
+            output_dir,
+            resized_output_dir,
+            storage=get_backend(overwrite=True) if args.upload else None,
+        )
+        sys.exit(0)
+
+    # load X games
+    with SessionLocal() as db:
+        solutions = crud.read_jumble_games(
+            db, start_date=dt.date.today() - dt.timedelta(days=1), limit=60
+        )
     # generate images
     generate_jumble_images(output_dir, solutions, resized_output_dir)
@@ -0,0 +1,123 @@
+"""Content-addressed cache of generated prompts and images, so gen.py reruns only pay for what changed.
+
+Entries are keyed by a hash of everything that went into generating them (see
+gen.prompt_cache_key/image_cache_key), not by game id, which a database
+rebuild can reassign. The manifest also records which image each game id's
+published files were made from, so unchanged games are skipped outright and
+games whose id now points at another image get re-encoded from the cache.
+
+The manifest is a journal: each entry put is appended as one JSONL line, so a
+backfill writes O(entries) instead of rewriting the whole manifest per entry.
+It is compacted on load when entries were overwritten or a line was cut off.
+
+    cache_dir/manifest.jsonl     ["prompts"|"images"|"outputs", key, value] lines
+    cache_dir/images/ab/abc….png images as returned by the API
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from pastiche import config
+from pastiche.utils import write_text_atomic
+
+SECTIONS = ("prompts", "images", "outputs")
+
+
+def content_key(**fields) -> str:
+    return hashlib.sha256(
+        json.dumps(fields, sort_keys=True, ensure_ascii=False).encode()
+    ).hexdigest()
+
+
+class GenerationCache:
+    def __init__(self, root: Path = config.GENERATION_CACHE_DIRECTORY) -> None:
+        self.root = Path(root)
+        self.journal_path = self.root / "manifest.jsonl"
+        self.prompts: dict[str, str] = {}
+        self.images: dict[str, str] = {}
+        self.outputs: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        sections = {name: getattr(self, name) for name in SECTIONS}
+        n_lines = 0
+        # manifest.json: the manifest before it was a journal
+        legacy_path = self.root / "manifest.json"
+        try:
+            for name, entries in json.loads(legacy_path.read_text()).items():
+                sections[name].update(entries)
+        except FileNotFoundError:
+            legacy_path = None
+        try:
+            with open(self.journal_path, encoding="utf-8") as file:
+                for line in file:
+                    n_lines += 1
+                    try:
+                        name, key, value = json.loads(line)
+                    except ValueError:
+                        # cut off by an interrupted run
+                        continue
+                    sections[name][key] = value
+        except FileNotFoundError:
+            pass
+        n_entries = sum(len(entries) for entries in sections.values())
+        if legacy_path is not None or n_lines > n_entries:
+            write_text_atomic(
+                self.journal_path,
+                "".join(
+                    self._line(name, key, value)
+                    for name, entries in sections.items()
+                    for key, value in entries.items()
+                ),
+            )
+        if legacy_path is not None:
+            legacy_path.unlink()
+
+    def get_prompt(self, key: str) -> str | None:
+        return self.prompts.get(key)
+
+    def put_prompt(self, key: str, prompt: str) -> None:
+        with self._lock:
+            self.prompts[key] = prompt
+            self._append("prompts", key, prompt)
+
+    def has_image(self, key: str) -> bool:
+        return key in self.images and (self.root / self.images[key]).is_file()
+
+    def get_image(self, key: str) -> bytes | None:
+        if not self.has_image(key):
+            return None
+        return (self.root / self.images[key]).read_bytes()
+
+    def put_image(self, key: str, image_bytes: bytes) -> None:
+        relative_path = f"images/{key[:2]}/{key}.png"
+        path = self.root / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = path.with_suffix(".part")
+        partial_path.write_bytes(image_bytes)
+        os.replace(partial_path, path)
+        with self._lock:
+            self.images[key] = relative_path
+            self._append("images", key, relative_path)
+
+    def output(self, game_id: int) -> str | None:
+        """Key of the image game_id's published files were made from"""
+        return self.outputs.get(str(game_id))
+
+    def set_output(self, game_id: int, image_key: str) -> None:
+        with self._lock:
+            self.outputs[str(game_id)] = image_key
+            self._append("outputs", str(game_id), image_key)
+
+    @staticmethod
+    def _line(name: str, key: str, value: str) -> str:
+        return json.dumps([name, key, value], ensure_ascii=False) + "\n"
+
+    def _append(self, name: str, key: str, value: str) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as file:
+            file.write(self._line(name, key, value))
@@ -0,0 +1,61 @@
+"""Names and srcsets of the responsive derivatives of game images.
+
+The derivatives themselves are encoded and uploaded by pastiche.gen, which
+records the games they were uploaded for in PublishedDerivatives. The page
+only offers srcsets for those: browsers don't fall back to src when the
+srcset candidate they picked is missing. This module stays free of PIL so the
+web app can build image URLs without importing it.
+"""
+
+import json
+import threading
+from pathlib import Path
+
+from pastiche.config import BASE_IMAGE_URL, IMAGE_WIDTHS, PUBLISHED_DERIVATIVES_PATH
+from pastiche.utils import write_json_atomic
+
+# derivative formats, with the extension of their files
+IMAGE_FORMATS = {"webp": "webp", "jpeg": "jpg"}
+
+
+def derivative_name(game_id: int, width: int, image_format: str) -> str:
+    return f"{game_id}-{width}w.{IMAGE_FORMATS[image_format]}"
+
+
+def image_srcset(
+    game_id: int, image_format: str, base_url: str = BASE_IMAGE_URL
+) -> str:
+    return ", ".join(
+        f"{base_url}/{derivative_name(game_id, width, image_format)} {width}w"
+        for width in IMAGE_WIDTHS
+    )
+
+
+class PublishedDerivatives:
+    """Ids of the games whose derivatives are uploaded, persisted at path"""
+
+    def __init__(self, path: Path = PUBLISHED_DERIVATIVES_PATH) -> None:
+        self.path = Path(path)
+        try:
+            self.game_ids = set(json.loads(self.path.read_text()))
+        except FileNotFoundError:
+            self.game_ids = set()
+        self._lock = threading.Lock()
+
+    def __contains__(self, game_id: int) -> bool:
+        return game_id in self.game_ids
+
+    def add(self, game_id: int) -> None:
+        with self._lock:
+            self.game_ids.add(game_id)
+            self._save()
+
+    def discard(self, game_id: int) -> None:
+        """Before replacing a game's derivatives: until all are uploaded, they may not match its image"""
+        with self._lock:
+            if game_id in self.game_ids:
+                self.game_ids.discard(game_id)
+                self._save()
+
+    def _save(self) -> None:
+        write_json_atomic(self.path, sorted(self.game_ids))
@@ -0,0 +1,311 @@
+"""Ingest path: creating and populating the database from the scraped jumble answers.
+
+Kept apart from pastiche.database so serving the app does not import the
+pydantic/pandas ingest models unless the database actually needs (re)building.
+"""
+
+from pathlib import Path
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Any, Iterable, Iterator
+from pydantic import BaseModel
+from sqlalchemy import Connection, Engine, delete, func, insert, select, text, update
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import selectinload
+
+from pastiche import tables
+from pastiche.config import LOCAL_DB_PATH, RESET_DATE
+from pastiche.database import SessionLocal, create_db_engine, engine
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def create_tables(drop_if_exists: True, bind: Engine = engine):
+    """Helper to create all tables defined under pastiche.tables. If db exists, drop and recreate new ones"""
+    if drop_if_exists:
+        tables.Base.metadata.drop_all(bind)
+    # create tables
+    tables.Base.metadata.create_all(bind)
+
+
+def iter_game_rows(
+    games: Iterable[BaseModel],
+    reset_dates: bool = True,
+    first_date: datetime = RESET_DATE,
+) -> Iterator[tuple[dict[str, Any], list[dict[str, Any]]]]:
+    """Yields (jumble_games row, jumbles rows) for each validated game, jumbles rows without their parent id.
+    With reset_dates, games are laid on consecutive days from first_date"""
+    for i, game in enumerate(games):
+        game_dict = game.model_dump()
+        jumbles_list = game_dict.pop("jumbles")
+        if reset_dates:
+            game_dict["value_date"] = first_date + timedelta(days=i)
+        game_dict["value_day"] = game_dict["value_date"].date()
+        game_dict["sanitized_solution"] = tables.JumbleGame.sanitize_solution(
+            game_dict["solution_unjumbled"], game_dict["solution"]
+        )
+        jumbles = [
+            {
+                **t,
+                "clue_indices": tables.Jumble.encode_clue_indices(t["clue_indices"]),
+                "clue_mask": tables.Jumble.encode_clue_mask(t["clue_indices"]),
+            }
+            for t in jumbles_list
+        ]
+        yield game_dict, jumbles
+
+
+def _insert_chunk(
+    conn: Connection, chunk: list[tuple[dict[str, Any], list[dict[str, Any]]]]
+) -> list[int]:
+    """Inserts (game, jumbles) rows with Core executemany, returns the games' ids"""
+    game_ids = conn.scalars(
+        insert(tables.JumbleGame).returning(
+            tables.JumbleGame.id, sort_by_parameter_order=True
+        ),
+        [game for game, _ in chunk],
+    ).all()
+    conn.execute(
+        insert(tables.Jumble),
+        [
+            {**jumble, "jumble_game_id": game_id}
+            for game_id, (_, jumbles) in zip(game_ids, chunk)
+            for jumble in jumbles
+        ],
+    )
+    return game_ids
+
+
+def insert_games(
+    rows: Iterable[tuple[dict[str, Any], list[dict[str, Any]]]],
+    bind: Engine = engine,
+    chunk_size: int = 2000,
+) -> int:
+    """Bulk inserts (game, jumbles) rows, one transaction per chunk of games.
+    Returns the number of games inserted"""
+    n_games = 0
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        with bind.begin() as conn:
+            _insert_chunk(conn, chunk)
+        n_games += len(chunk)
+    return n_games
+
+
+def dedupe_games(games: Iterable[BaseModel]) -> list[BaseModel]:
+    """One game per source page: a page scraped again replaces its earlier game, at the earlier game's position"""
+    by_url = {}
+    for game in games:
+        by_url[game.url_from] = game
+    return list(by_url.values())
+
+
+def upsert_games(games: list[BaseModel], bind: Engine = engine) -> list[int]:
+    """Writes validated games in a single transaction, keyed by their source page (url_from, one per day):
+    games already in the database are updated in place and keep their day, new ones are laid on the days
+    following the last one, as a rebuild from the archive they were appended to would. Returns the games' ids
+    """
+    games = dedupe_games(games)
+    with bind.begin() as conn:
+        existing = dict(
+            conn.execute(
+                select(tables.JumbleGame.url_from, tables.JumbleGame.id).where(
+                    tables.JumbleGame.url_from.in_([game.url_from for game in games])
+                )
+            ).all()
+        )
+        last_day = conn.scalar(select(func.max(tables.JumbleGame.value_day)))
+        first_date = (
+            datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+            if last_day is not None
+            else RESET_DATE
+        )
+
+        new_games = [game for game in games if game.url_from not in existing]
+        game_ids = []
+        if new_games:
+            game_ids += _insert_chunk(
+                conn, list(iter_game_rows(new_games, first_date=first_date))
+            )
+
+        for game_row, jumbles in iter_game_rows(
+            [game for game in games if game.url_from in existing], reset_dates=False
+        ):
+            game_id = existing[game_row["url_from"]]
+            # the day was given when the game was first inserted
+            del game_row["value_date"], game_row["value_day"]
+            conn.execute(
+                update(tables.JumbleGame)
+                .where(tables.JumbleGame.id == game_id)
+                .values(**game_row)
+            )
+            conn.execute(
+                delete(tables.Jumble).where(tables.Jumble.jumble_game_id == game_id)
+            )
+            conn.execute(
+                insert(tables.Jumble),
+                [{**jumble, "jumble_game_id": game_id} for jumble in jumbles],
+            )
+            game_ids.append(game_id)
+    return game_ids
+
+
+def populate_database(
+    path: str | Path, reset_dates: bool = True, bind: Engine = engine
+) -> None:
+    """Populates database with historical jumble games"""
+    from pastiche.game import JumbleGameCollection
+
+    historical_games = JumbleGameCollection.from_jumble_answers(path)
+    insert_games(
+        iter_game_rows(dedupe_games(historical_games.games), reset_dates), bind=bind
+    )
+
+
+def refresh_daily_payloads(
+    game_ids: Iterable[int] | None = None, bind: Engine = engine
+) -> int:
+    """Re-serializes the daily_payloads rows of the given games (all games if None), writing only the rows that changed.
+    A full refresh also deletes rows of days left without a game. Returns the number of rows written
+    """
+    with SessionLocal(bind=bind) as db:
+        query = (
+            db.query(tables.JumbleGame)
+            .options(selectinload(tables.JumbleGame.jumbles))
+            .filter(tables.JumbleGame.value_day.is_not(None))
+            .order_by(tables.JumbleGame.id)
+        )
+        existing = db.query(tables.DailyPayload)
+        if game_ids is not None:
+            game_ids = list(game_ids)
+            query = query.filter(tables.JumbleGame.id.in_(game_ids))
+
+        fresh = {}
+        for game in query:
+            # as crud.read_jumble_game, the first game of a day is the one served
+            fresh.setdefault(game.value_day, tables.DailyPayload.from_game(game))
+
+        if game_ids is not None:
+            existing = existing.filter(tables.DailyPayload.value_day.in_(list(fresh)))
+        existing = {row.value_day: row for row in existing}
+
+        n_written = 0
+        for value_day, row in fresh.items():
+            current = existing.get(value_day)
+            if current is None:
+                db.add(row)
+            elif (current.jumble_game_id, current.payload, current.answers) != (
+                row.jumble_game_id,
+                row.payload,
+                row.answers,
+            ):
+                current.jumble_game_id = row.jumble_game_id
+                current.payload = row.payload
+                current.answers = row.answers
+            else:
+                continue
+            n_written += 1
+
+        if game_ids is None:
+            for value_day, row in existing.items():
+                if value_day not in fresh:
+                    db.delete(row)
+                    n_written += 1
+
+        db.commit()
+    return n_written
+
+
+def extend_source_hash(source_hash: str, appended: bytes) -> str:
+    """Chains the hash of the source over the lines appended to it, so appending to the source only costs hashing the new lines"""
+    for line in appended.splitlines(keepends=True):
+        source_hash = hashlib.sha256(source_hash.encode() + line).hexdigest()
+    return source_hash
+
+
+def compute_fingerprint(path: str | Path) -> dict[str, str]:
+    """Fingerprint of the snapshot built from the games at `path`: schema version, size of the source,
+    and a hash chained over its lines, starting from the dates it is laid on"""
+    source = Path(path).read_bytes()
+    return {
+        "schema_version": str(tables.SCHEMA_VERSION),
+        "source_size": str(len(source)),
+        "source_hash": extend_source_hash(RESET_DATE.isoformat(), source),
+    }
+
+
+def extend_fingerprint(fingerprint: dict[str, str], appended: bytes) -> dict[str, str]:
+    """Fingerprint after appending lines to the source, without reading it again"""
+    return {
+        **fingerprint,
+        "source_size": str(int(fingerprint["source_size"]) + len(appended)),
+        "source_hash": extend_source_hash(fingerprint["source_hash"], appended),
+    }
+
+
+def matches_source_size(fingerprint: dict[str, str] | None, path: str | Path) -> bool:
+    """Cheap check that a fingerprint is current for the source at `path`, on its schema version and size only"""
+    return (
+        fingerprint is not None
+        and fingerprint.get("schema_version") == str(tables.SCHEMA_VERSION)
+        and fingerprint.get("source_size") == str(Path(path).stat().st_size)
+        and "source_hash" in fingerprint
+    )
+
+
+def read_fingerprint(bind: Engine = engine) -> dict[str, str] | None:
+    """Fingerprint stored in the database, None if it has no metadata table (missing or pre-fingerprint database)"""
+    try:
+        with SessionLocal(bind=bind) as db:
+            rows = db.execute(select(tables.DbMetadata)).scalars().all()
+    except (OperationalError, ProgrammingError):
+        return None
+    return {row.key: row.value for row in rows}
+
+
+def write_fingerprint(fingerprint: dict[str, str], bind: Engine = engine) -> None:
+    with SessionLocal(bind=bind) as db:
+        for key, value in fingerprint.items():
+            db.merge(tables.DbMetadata(key=key, value=value))
+        db.commit()
+
+
+def build_snapshot(path: str | Path, db_path: str = LOCAL_DB_PATH) -> None:
+    """Builds a fresh database from the games at `path`, stamps it with its fingerprint and atomically moves it to db_path"""
+    building_path = f"{db_path}.building"
+    Path(building_path).unlink(missing_ok=True)
+
+    build_engine = create_db_engine(building_path, mode="read_write")
+    try:
+        create_tables(drop_if_exists=False, bind=build_engine)
+        populate_database(path, bind=build_engine)
+        refresh_daily_payloads(bind=build_engine)
+        write_fingerprint(compute_fingerprint(path), bind=build_engine)
+        # self-contained file, readable without its -wal/-shm companions
+        with build_engine.connect() as conn:
+            conn.execute(text("PRAGMA journal_mode=DELETE"))
+    finally:
+        build_engine.dispose()
+
+    os.replace(building_path, db_path)
+    # drop pooled connections still pointing at the replaced file
+    engine.dispose()
+
+
+def check_and_populate_db(path: str | Path) -> None:
+    """Check that the database was built from the games at `path` with the current schema, if not, rebuild it"""
+    if read_fingerprint() != compute_fingerprint(path):
+        logger.info("Database is missing or out of date. Building a new snapshot...")
+        build_snapshot(path)
+
+    logger.info("Database is ready (＾◡＾)っ✂╰⋃╯")
+
+
+if __name__ == "__main__":
+    from pastiche.config import LOCAL_GAMES_PATH
+
+    check_and_populate_db(LOCAL_GAMES_PATH)
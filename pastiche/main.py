@@ -1,30 +1,28 @@
-from itertools import groupby
 import hashlib
+import json
 from pathlib import Path
-import pandas as pd
 from datetime import date, datetime
 from contextlib import asynccontextmanager
+from functools import partial
 
-from fastapi import Depends, FastAPI, Request, Form
+from fastapi import FastAPI, Request, Form
 from fastapi import HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
-
-from pastiche.database import SessionLocal, check_and_populate_db
-from pastiche import crud, config
+from fastapi.templating import Jinja2Templates
+from pydantic import BaseModel, Field, model_validator
+
+from pastiche.database import SessionLocal, run_in_db_executor
+from pastiche.ingest import check_and_populate_db
+from pastiche import crud, config, streaks
+from pastiche.assets import PrecompressedStaticFiles, load_static_hashes
+from pastiche.cache import GameCache, GameSnapshot, PageCache
+from pastiche.images import PublishedDerivatives, image_srcset
 from pastiche.messages import random_greeting
 
 
-def _build_static_hashes(static_dir: str) -> dict[str, str]:
-    hashes = {}
-    for path in Path(static_dir).rglob("*"):
-        if path.is_file():
-            digest = hashlib.md5(path.read_bytes()).hexdigest()[:10]
-            rel = path.relative_to(static_dir).as_posix()
-            hashes[rel] = digest
-    return hashes
+def _hash_mapping(mapping: dict[str, str]) -> str:
+    return hashlib.md5(json.dumps(mapping, sort_keys=True).encode()).hexdigest()[:10]
 
 
 @asynccontextmanager
@@ -40,9 +38,22 @@ tags = [
 
 app = FastAPI(title="Pastiche", openapi_tags=tags, lifespan=load_db)
 
-app.mount("/static", StaticFiles(directory=config.STATIC_DIRECTORY), name="static")
-
-_static_hashes = _build_static_hashes(config.STATIC_DIRECTORY)
+_static_hashes = load_static_hashes(config.STATIC_DIRECTORY)
+
+app.mount(
+    "/static",
+    PrecompressedStaticFiles(directory=config.STATIC_DIRECTORY, hashes=_static_hashes),
+    name="static",
+)
+
+if config.IMAGE_STORAGE == "local":
+    # images "uploaded" by pastiche.storage.LocalBackend
+    config.LOCAL_IMAGE_DIRECTORY.mkdir(parents=True, exist_ok=True)
+    app.mount(
+        config.LOCAL_IMAGE_URL,
+        StaticFiles(directory=config.LOCAL_IMAGE_DIRECTORY),
+        name="images",
+    )
 
 templates = Jinja2Templates(directory=config.TEMPLATES_DIRECTORY)
 
@@ -55,13 +66,71 @@ def _static_url(filename: str) -> str:
 templates.env.globals["static_url"] = _static_url
 
 
-def get_db():
-    """Helper function which opens a connection to the database and also manages closing the connection"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _is_clue(clue_mask: int, index: int) -> bool:
+    return bool(clue_mask >> index & 1)
+
+
+templates.env.globals["is_clue"] = _is_clue
+
+game_cache = GameCache(maxsize=config.GAME_CACHE_SIZE, ttl=config.GAME_CACHE_TTL)
+
+page_cache = PageCache(maxsize=config.PAGE_CACHE_SIZE)
+
+# games whose responsive derivatives are uploaded, the others only have their thumbnail
+published_derivatives = PublishedDerivatives()
+
+_template_hash = hashlib.md5(
+    (Path(config.TEMPLATES_DIRECTORY) / "index.html").read_bytes()
+).hexdigest()[:10]
+
+_static_manifest_hash = _hash_mapping(_static_hashes)
+
+
+def read_game_snapshot(value_date: date) -> GameSnapshot | None:
+    with SessionLocal() as db:
+        daily_payload = crud.read_daily_payload(db, value_date=value_date)
+        if daily_payload is None:
+            return None
+        return GameSnapshot.from_daily_payload(daily_payload)
+
+
+def read_game_snapshot_by_id(game_id: int) -> GameSnapshot | None:
+    with SessionLocal() as db:
+        daily_payload = crud.read_daily_payload_by_game_id(db, game_id=game_id)
+        if daily_payload is None:
+            return None
+        return GameSnapshot.from_daily_payload(daily_payload)
+
+
+# day served by each game id seen so far, so lookups by id can go through the game cache
+_game_days: dict[int, date] = {}
+
+
+async def load_game_snapshot(value_date: date) -> GameSnapshot | None:
+    """Loads the game played on value_date through the in-process game cache.
+    Cache hits are served on the event loop, misses (and waiting on a concurrent load) run in the database threads
+    """
+    game = game_cache.get_cached(value_date)
+    if game is None:
+        game = await run_in_db_executor(
+            game_cache.get, value_date, partial(read_game_snapshot, value_date)
+        )
+        if game is not None:
+            _game_days[game.id] = game.value_day
+    return game
+
+
+async def load_game_snapshot_by_id(game_id: int) -> GameSnapshot | None:
+    """Loads a game by id through the in-process game cache, only reaching the database for ids never seen before"""
+    value_day = _game_days.get(game_id)
+    if value_day is not None:
+        return await load_game_snapshot(value_day)
+    game = await run_in_db_executor(read_game_snapshot_by_id, game_id)
+    if game is None:
+        return None
+    _game_days[game.id] = game.value_day
+    # keep the cached snapshot if there is one, so all lookups share it
+    return game_cache.put_if_absent(game.value_day, game)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -79,21 +148,32 @@ async def play_jumble():
 
 
 @app.get("/{value_date}")
-async def load_daily_jumble(
-    request: Request, value_date: date, db: Session = Depends(get_db)
-):
-    game = crud.read_jumble_game(db, value_date=value_date)
+async def load_daily_jumble(request: Request, value_date: date):
+    game = await load_game_snapshot(value_date)
     if game is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No game found for {value_date}",
         )
-    context = {
-        "request": request,
-        "image_url": f"{config.BASE_IMAGE_URL}/{game.id}.jpg",
-    }
-    context.update(**game.to_sanitized_dict())
-    return templates.TemplateResponse("index.html", context)
+
+    def render(game: GameSnapshot) -> bytes:
+        context = {
+            "request": request,
+            "image_url": f"{config.BASE_IMAGE_URL}/{game.id}.jpg",
+        }
+        if game.id in published_derivatives:
+            context["image_srcset_webp"] = image_srcset(game.id, "webp")
+            context["image_srcset_jpeg"] = image_srcset(game.id, "jpeg")
+        context.update(**game.payload)
+        return templates.get_template("index.html").render(context).encode()
+
+    page = page_cache.get(
+        (value_date, _template_hash, _static_manifest_hash), game, render
+    )
+    headers = {"ETag": page.etag, "Cache-Control": config.PAGE_CACHE_CONTROL}
+    if page.matches(request.headers.get("if-none-match")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return HTMLResponse(content=page.body, headers=headers)
 
 
 @app.post("/check")
@@ -101,60 +181,76 @@ async def check_submission(
     value_date: str = Form(...),
     jumble_letters: list[str] = Form(...),
     solution_letters: list[str] = Form(...),
-    db: Session = Depends(get_db),
 ):
     # convert back to date
-    value_date = datetime.strptime(value_date, config.DISPLAY_DATE_FORMAT)
+    value_date = datetime.strptime(value_date, config.DISPLAY_DATE_FORMAT).date()
     # load jumble solution
-    game = crud.read_jumble_game(db, value_date=value_date)
-    # check if global solution is correct
-    is_correct = "".join(solution_letters) == game.solution
-    # check if each jumble is correct
+    game = await load_game_snapshot(value_date)
+    if game is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No game found for {value_date}",
+        )
+    # split the letters back into one word per jumble
+    jumbles = []
     seen_letters = 0
-    jumbles_correct = {}
-    for i, jumble in enumerate(game.jumbles):
-        n_jumble = len(jumble.unjumbled)
-        to_check = jumble_letters[seen_letters : seen_letters + n_jumble]
-        jumbles_correct[i + 1] = "".join(to_check) == jumble.unjumbled
-
+    for unjumbled in game.answers:
+        n_jumble = len(unjumbled)
+        jumbles.append("".join(jumble_letters[seen_letters : seen_letters + n_jumble]))
         seen_letters += n_jumble
 
-    return {"is_correct": is_correct, "is_jumbles_correct": jumbles_correct}
+    return game.check("".join(solution_letters), jumbles)
 
 
-@app.post("/statistics")
-async def compute_statistics(value_dates: list[dict[str, str | int]]):
-    """End point to compute statistics based on a list of value_date played"""
-    if len(value_dates) > 0:
-        df = pd.DataFrame(value_dates)
-        df["valueDate"] = df["valueDate"].apply(
-            lambda x: datetime.strptime(x, config.DISPLAY_DATE_FORMAT)
-        )
-        fastest_time = int(df["elapsedTime"].min())
-        count_played = int(df["valueDate"].nunique())
+# the most a game has: 6 jumbles, and the solution
+MAX_GAME_JUMBLES = 6
+MAX_GAME_WORDS = MAX_GAME_JUMBLES + 1
+
 
-        df.set_index("valueDate", inplace=True)
-        df = df.resample("D").first()
-        df.sort_index(inplace=True)
+class Submission(BaseModel):
+    solution: str = Field(..., description="The submitted solution, letters only")
+    jumbles: list[str] = Field(
+        default_factory=list,
+        max_length=MAX_GAME_JUMBLES,
+        description="The submitted unjumbled words, in order",
+    )
 
-        played_dates = ~df["elapsedTime"].isnull()
 
-        consecutive_dates = []
-        for k, g in groupby(enumerate(played_dates), lambda x: x[1]):
-            if k:
-                consecutive_dates.append(list(map(lambda x: x[0], list(g))))
+class CheckRequest(BaseModel):
+    game_id: int | None = None
+    value_date: date | None = Field(None, description="ISO date of the game")
+    # one per word of the game at most, each costs a hash comparison
+    submissions: list[Submission] = Field(..., max_length=MAX_GAME_WORDS)
 
-        max_streak = int(max([len(t) for t in consecutive_dates]))
-        current_streak = int([len(t) for t in consecutive_dates][-1])
-    else:
-        count_played = 0
-        fastest_time = None
-        max_streak = 0
-        current_streak = 0
+    @model_validator(mode="after")
+    def one_game_reference(self) -> "CheckRequest":
+        if (self.game_id is None) == (self.value_date is None):
+            raise ValueError("Exactly one of game_id or value_date must be given")
+        return self
 
+
+@app.post("/api/check")
+async def check_submissions(check_request: CheckRequest):
+    """Checks several submissions for one game, referenced by id or ISO date"""
+    if check_request.game_id is not None:
+        game = await load_game_snapshot_by_id(check_request.game_id)
+    else:
+        game = await load_game_snapshot(check_request.value_date)
+    if game is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No game found",
+        )
     return {
-        "played": count_played,
-        "fastest": fastest_time,
-        "max_streak": max_streak,
-        "current_streak": current_streak,
+        "game_id": game.id,
+        "value_date": game.value_day,
+        "results": [
+            game.check(t.solution, t.jumbles) for t in check_request.submissions
+        ],
     }
+
+
+@app.post("/statistics")
+async def compute_statistics(value_dates: list[dict[str, str | int]]):
+    """End point to compute statistics based on a list of value_date played"""
+    return streaks.compute_statistics(value_dates)
@@ -0,0 +1,148 @@
+"""Staged pipeline: each stage has its own worker threads and a bounded input queue.
+
+Items flow through the stages in order. A full queue blocks the stage feeding
+it, so a slow stage holds back the ones upstream instead of piling up items
+(and their memory) in between. A stage returning None drops the item; a stage
+raising drops it too and counts it as failed.
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+
+    processed: int = field(default=0, init=False)
+    failed: int = field(default=0, init=False)
+    in_flight: int = field(default=0, init=False)
+    busy_time: float = field(default=0.0, init=False)
+
+    def stats(self, backlog: int, elapsed: float) -> dict:
+        return {
+            "processed": self.processed,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "backlog": backlog,
+            "throughput": self.processed / elapsed if elapsed else 0.0,
+            # fraction of the stage's worker time spent processing
+            "utilization": (
+                self.busy_time / (elapsed * self.workers) if elapsed else 0.0
+            ),
+        }
+
+
+class Pipeline:
+    def __init__(
+        self,
+        stages: list[Stage],
+        queue_size: int = 8,
+        report_interval: float | None = None,
+        on_error: Callable[[Stage, Any, Exception], None] | None = None,
+    ) -> None:
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.report_interval = report_interval
+        self.on_error = on_error
+        self.results = []
+        self._lock = threading.Lock()
+        self._start = None
+
+    def stats(self) -> dict[str, dict]:
+        elapsed = time.perf_counter() - self._start if self._start else 0.0
+        return {
+            stage.name: stage.stats(q.qsize(), elapsed)
+            for stage, q in zip(self.stages, self.queues)
+        }
+
+    def report(self) -> str:
+        return "  ".join(
+            f"{name}: {s['processed']} done {s['failed']} failed {s['backlog']} queued"
+            f" {s['throughput']:.2f}/s {s['utilization']:.0%} busy"
+            for name, s in self.stats().items()
+        )
+
+    def run(self, items: Iterable) -> list:
+        """Push items through all the stages, return what comes out of the last one"""
+        self._start = time.perf_counter()
+        feeder = threading.Thread(target=self._feed, args=(items,), daemon=True)
+        feeder.start()
+        workers = []
+        for i, stage in enumerate(self.stages):
+            threads = [
+                threading.Thread(
+                    target=self._work, args=(i,), name=f"{stage.name}-{n}", daemon=True
+                )
+                for n in range(stage.workers)
+            ]
+            for thread in threads:
+                thread.start()
+            workers.append(threads)
+
+        stop_reporting = threading.Event()
+        if self.report_interval:
+            reporter = threading.Thread(
+                target=self._report_until, args=(stop_reporting,), daemon=True
+            )
+            reporter.start()
+
+        feeder.join()
+        for i, threads in enumerate(workers):
+            for thread in threads:
+                thread.join()
+            # the stage is drained, let the next one finish too
+            if i + 1 < len(self.stages):
+                for _ in range(self.stages[i + 1].workers):
+                    self.queues[i + 1].put(_DONE)
+        stop_reporting.set()
+        return self.results
+
+    def _feed(self, items: Iterable) -> None:
+        for item in items:
+            self.queues[0].put(item)
+        for _ in range(self.stages[0].workers):
+            self.queues[0].put(_DONE)
+
+    def _work(self, i: int) -> None:
+        stage = self.stages[i]
+        inbox = self.queues[i]
+        outbox = self.queues[i + 1] if i + 1 < len(self.stages) else None
+        while (item := inbox.get()) is not _DONE:
+            with self._lock:
+                stage.in_flight += 1
+            start = time.perf_counter()
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                result = None
+                with self._lock:
+                    stage.failed += 1
+                if self.on_error is not None:
+                    self.on_error(stage, item, e)
+            else:
+                with self._lock:
+                    stage.processed += 1
+            finally:
+                with self._lock:
+                    stage.in_flight -= 1
+                    stage.busy_time += time.perf_counter() - start
+
+            if result is None:
+                continue
+            if outbox is not None:
+                outbox.put(result)
+            else:
+                with self._lock:
+                    self.results.append(result)
+
+    def _report_until(self, stop: threading.Event) -> None:
+        while not stop.wait(self.report_interval):
+            print(self.report())
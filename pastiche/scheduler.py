@@ -0,0 +1,249 @@
+"""Rate-limit-aware scheduling of API calls (OpenAI's, in gen.py).
+
+A RequestScheduler runs coroutines under:
+- token buckets for requests and tokens per minute, so calls are paced to the
+  quota instead of discovering it through 429s,
+- a pause honouring Retry-After, shared by all the calls, when a 429 comes anyway,
+- jittered exponential backoff for other transient errors,
+- adaptive concurrency and pace: after a full window of successes the
+  concurrency limit grows by one and the pace back towards the configured
+  limits, on a rate limit the concurrency halves and the pace drops by a
+  quarter (AIMD). Limits set too high thus settle below the actual quota.
+
+Its asyncio primitives bind to the event loop that first uses them, so use a
+scheduler from a single loop. LoopThread runs one for threaded callers.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import openai
+
+# lowest fraction of the configured rates rate limits can slow the scheduler to
+MIN_PACE = 0.1
+
+
+class TokenBucket:
+    """Holds up to capacity tokens, refilled at rate_per_minute"""
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None) -> None:
+        self.rate = rate_per_minute / 60
+        # a second's worth of burst by default, at least one token
+        self.capacity = capacity or max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.base_rate, self.base_capacity = self.rate, self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        # more than the capacity would never fit, take the whole bucket instead
+        amount = min(amount, self.capacity)
+        # first come first served: later callers queue on the lock
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def scale(self, factor: float) -> None:
+        """Run at factor times the configured rate"""
+        self._refill()
+        self.rate = self.base_rate * factor
+        self.capacity = max(1.0, self.base_capacity * factor)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """Give back (positive) or charge (negative) tokens, once the actual cost is known"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RequestScheduler:
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float | None = None,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        initial_concurrency: int | None = None,
+        attempts: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ) -> None:
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency = initial_concurrency or max_concurrency
+        # fraction of the configured rates the buckets run at
+        self.pace = 1.0
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+        self._slots = asyncio.Condition()
+
+    async def submit(self, fn, *args, tokens: int = 0, usage=None, **kwargs):
+        """Await fn(*args, **kwargs) within the rate limits, retrying transient errors.
+
+        tokens is the estimated token cost of the call. usage(result), when
+        given, returns the actual one to settle the token bucket with.
+        """
+        for attempt in range(self.attempts):
+            await self._wait_pause()
+            await self.requests.acquire()
+            if self.tokens is not None and tokens:
+                await self.tokens.acquire(tokens)
+            await self._acquire_slot()
+            try:
+                result = await fn(*args, **kwargs)
+            except openai.RateLimitError as e:
+                if getattr(e, "code", None) == "insufficient_quota":
+                    # billing, retrying won't help
+                    self.failed += 1
+                    raise
+                self.rate_limited += 1
+                self._decrease()
+                delay = retry_after(e.response) or self._backoff(attempt)
+                self._pause(delay)
+                error = e
+            except (
+                openai.APIConnectionError,
+                openai.APITimeoutError,
+                openai.InternalServerError,
+            ) as e:
+                delay = retry_after(getattr(e, "response", None)) or self._backoff(
+                    attempt
+                )
+                error = e
+            except Exception:
+                self.failed += 1
+                raise
+            else:
+                self._increase()
+                self.completed += 1
+                if self.tokens is not None and usage is not None:
+                    actual = usage(result)
+                    if actual is not None:
+                        self.tokens.adjust(tokens - actual)
+                return result
+            finally:
+                await self._release_slot()
+
+            if attempt + 1 < self.attempts:
+                self.retries += 1
+                await asyncio.sleep(delay)
+        self.failed += 1
+        raise error
+
+    def stats(self) -> dict:
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "concurrency": self.concurrency,
+            "pace": round(self.pace, 3),
+            "in_flight": self.in_flight,
+        }
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def _pause(self, delay: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    async def _wait_pause(self) -> None:
+        while (remaining := self._paused_until - time.monotonic()) > 0:
+            # jitter, so paused calls don't all resume at once
+            await asyncio.sleep(remaining + random.uniform(0, min(1.0, remaining)))
+
+    async def _acquire_slot(self) -> None:
+        async with self._slots:
+            await self._slots.wait_for(lambda: self.in_flight < self.concurrency)
+            self.in_flight += 1
+
+    async def _release_slot(self) -> None:
+        async with self._slots:
+            self.in_flight -= 1
+            self._slots.notify_all()
+
+    def _increase(self) -> None:
+        self._successes += 1
+        if self._successes >= self.concurrency:
+            self._successes = 0
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self._set_pace(min(1.0, self.pace + 0.05))
+
+    def _decrease(self) -> None:
+        # the calls in flight when the limit was hit fail together, count them once
+        now = time.monotonic()
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        self._successes = 0
+        self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+        self._set_pace(max(MIN_PACE, self.pace * 0.75))
+
+    def _set_pace(self, pace: float) -> None:
+        if pace == self.pace:
+            return
+        self.pace = pace
+        self.requests.scale(pace)
+        if self.tokens is not None:
+            self.tokens.scale(pace)
+
+
+def retry_after(response) -> float | None:
+    """Delay asked for by a response's retry-after-ms/retry-after headers, in seconds"""
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class LoopThread:
+    """An event loop in a daemon thread, for running coroutines from synchronous threads"""
+
+    def __enter__(self) -> "LoopThread":
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self, coro):
+        """Run coro on the loop, blocking the calling thread until it's done"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def __exit__(self, *exc_info) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
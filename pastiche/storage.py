@@ -0,0 +1,200 @@
+"""Where game images are uploaded: a GCS bucket, or a local directory the app serves itself.
+
+Both backends share one interface, so gen.py, the benchmarks and offline runs
+can swap one for the other. config.IMAGE_STORAGE picks the app's backend, and
+config.BASE_IMAGE_URL follows it.
+"""
+
+import os
+import random
+import shutil
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable
+
+import requests
+from google.api_core import exceptions as api_exceptions
+from google.cloud import storage
+
+from pastiche import config
+
+# worth retrying: throttling, server errors and dropped connections
+TRANSIENT_ERRORS = (
+    api_exceptions.TooManyRequests,
+    api_exceptions.InternalServerError,
+    api_exceptions.BadGateway,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.GatewayTimeout,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+
+def retry_with_backoff(
+    fn,
+    *args,
+    attempts: int = 5,
+    base_delay: float = 0.5,
+    max_delay: float = 30.0,
+    retry_on: tuple[type[Exception], ...] = TRANSIENT_ERRORS,
+    **kwargs,
+):
+    """Call fn, retrying transient errors with exponential backoff and full jitter"""
+    for i in range(attempts - 1):
+        try:
+            return fn(*args, **kwargs)
+        except retry_on as e:
+            delay = random.uniform(0, min(max_delay, base_delay * 2**i))
+            print(f"retrying in {delay:.2f}s after error: {e}")
+            time.sleep(delay)
+    return fn(*args, **kwargs)
+
+
+class StorageBackend(ABC):
+    """Uploads run on one thread pool per backend, created on first use, so at
+    most max_workers uploads are in flight however many callers upload at once"""
+
+    base_url: str
+
+    def __init__(self, max_workers: int = 8) -> None:
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @abstractmethod
+    def upload(self, source_file_name: Path, destination_name: str) -> bool:
+        """Upload a file, return False if destination_name already exists and overwriting is off"""
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="upload"
+                )
+        return self._executor
+
+    def upload_many(self, files: Iterable[tuple[Path, str]]) -> dict[str, Exception]:
+        """Upload (source_file_name, destination_name) pairs on the backend's pool, return the errors by destination"""
+        futures = {
+            self.executor.submit(self.upload, source, destination): destination
+            for source, destination in files
+        }
+        errors = {}
+        for future, destination in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                errors[destination] = e
+        return errors
+
+    def close(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def url(self, destination_name: str) -> str:
+        return f"{self.base_url}/{destination_name}"
+
+
+class GCSBackend(StorageBackend):
+    """Uploads to a GCS bucket through one shared client, created on first use.
+
+    The backend's uploads run on pool_size threads and the client's HTTP
+    session gets pool_size connections, so concurrent uploads reuse connections
+    instead of opening (and discarding) new ones.
+    """
+
+    def __init__(
+        self,
+        bucket_name: str = config.BUCKET_IMG,
+        client_factory: Callable[[], storage.Client] = storage.Client,
+        pool_size: int = 16,
+        overwrite: bool = False,
+        attempts: int = 5,
+    ) -> None:
+        super().__init__(max_workers=pool_size)
+        self.bucket_name = bucket_name
+        self.base_url = f"https://storage.googleapis.com/{bucket_name}"
+        self.client_factory = client_factory
+        self.pool_size = pool_size
+        self.overwrite = overwrite
+        self.attempts = attempts
+        self._bucket = None
+        self._lock = threading.Lock()
+
+    @property
+    def bucket(self) -> storage.Bucket:
+        with self._lock:
+            if self._bucket is None:
+                client = self.client_factory()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=self.pool_size, pool_maxsize=self.pool_size
+                )
+                client._http.mount("https://", adapter)
+                client._http.mount("http://", adapter)
+                self._bucket = client.bucket(self.bucket_name)
+        return self._bucket
+
+    def upload(self, source_file_name: Path, destination_name: str) -> bool:
+        blob = self.bucket.blob(destination_name)
+        try:
+            retry_with_backoff(
+                blob.upload_from_filename,
+                str(source_file_name),
+                # 0: only create, never replace an existing object
+                if_generation_match=None if self.overwrite else 0,
+                # retried here, with backoff, instead of by the library
+                retry=None,
+                attempts=self.attempts,
+            )
+        except api_exceptions.PreconditionFailed:
+            return False
+        return True
+
+
+class LocalBackend(StorageBackend):
+    """Copies files into a local directory, served by the app under config.LOCAL_IMAGE_URL"""
+
+    def __init__(
+        self,
+        root: Path = config.LOCAL_IMAGE_DIRECTORY,
+        base_url: str = config.LOCAL_IMAGE_URL,
+        overwrite: bool = False,
+        max_workers: int = 8,
+    ) -> None:
+        super().__init__(max_workers=max_workers)
+        self.root = Path(root)
+        self.base_url = base_url
+        self.overwrite = overwrite
+
+    def upload(self, source_file_name: Path, destination_name: str) -> bool:
+        destination = self.root / destination_name
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = destination.with_name(
+            f".{destination.name}.{threading.get_ident()}.part"
+        )
+        shutil.copyfile(source_file_name, partial_path)
+        try:
+            if self.overwrite:
+                os.replace(partial_path, destination)
+                return True
+            # link fails atomically when the destination exists
+            os.link(partial_path, destination)
+        except FileExistsError:
+            return False
+        finally:
+            partial_path.unlink(missing_ok=True)
+        return True
+
+
+def get_backend(kind: str = config.IMAGE_STORAGE, **kwargs) -> StorageBackend:
+    if kind == "gcs":
+        return GCSBackend(**kwargs)
+    if kind == "local":
+        return LocalBackend(**kwargs)
+    raise ValueError(f"Unknown image storage {kind!r}, expected 'gcs' or 'local'")
@@ -0,0 +1,54 @@
+import calendar
+from datetime import date, datetime
+from typing import Any, Iterable
+
+from pastiche.config import DISPLAY_DATE_FORMAT
+
+_MONTHS = {name: i for i, name in enumerate(calendar.month_name) if name}
+
+
+def parse_day_ordinal(value_date: str) -> int:
+    """Converts a displayed date (e.g. 'Friday, November 10 2023') to its proleptic Gregorian ordinal.
+    Splits the string directly when it has the default display format, several times faster than strptime
+    """
+    if DISPLAY_DATE_FORMAT == "%A, %B %d %Y":
+        try:
+            _, month_day_year = value_date.split(", ", 1)
+            month, day, year = month_day_year.split(" ")
+            return date(int(year), _MONTHS[month], int(day)).toordinal()
+        except (ValueError, KeyError):
+            pass
+    return datetime.strptime(value_date, DISPLAY_DATE_FORMAT).toordinal()
+
+
+def compute_streaks(day_ordinals: Iterable[int]) -> tuple[int, int]:
+    """Returns (max_streak, current_streak) from day ordinals in ascending order, duplicates allowed.
+    The current streak is the run of consecutive days ending on the last day played"""
+    max_streak = 0
+    current_streak = 0
+    previous = None
+    for day in day_ordinals:
+        if day == previous:
+            continue
+        if previous is not None and day == previous + 1:
+            current_streak += 1
+        else:
+            current_streak = 1
+        max_streak = max(max_streak, current_streak)
+        previous = day
+    return max_streak, current_streak
+
+
+def compute_statistics(value_dates: list[dict[str, Any]]) -> dict[str, int | None]:
+    """Computes the player's statistics from a list of {valueDate, elapsedTime} played"""
+    days = sorted(parse_day_ordinal(t["valueDate"]) for t in value_dates)
+    elapsed_times = [
+        t["elapsedTime"] for t in value_dates if t.get("elapsedTime") is not None
+    ]
+    max_streak, current_streak = compute_streaks(days)
+    return {
+        "played": len(set(days)),
+        "fastest": int(min(elapsed_times)) if elapsed_times else None,
+        "max_streak": max_streak,
+        "current_streak": current_streak,
+    }
@@ -1,5 +1,6 @@
+import json
 from typing import Any
-from datetime import datetime
+from datetime import date, datetime
 from sqlalchemy import ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship, declarative_base
 
@@ -7,6 +8,16 @@ from pastiche.config import DISPLAY_DATE_FORMAT, SANITIZE_SUB
 
 Base = declarative_base()
 
+# bump whenever the tables below change so existing snapshots get rebuilt
+SCHEMA_VERSION = 5
+
+
+class DbMetadata(Base):
+    __tablename__ = "db_metadata"
+
+    key: Mapped[str] = mapped_column(primary_key=True)
+    value: Mapped[str] = mapped_column(nullable=False)
+
 
 class Jumble(Base):
     __tablename__ = "jumbles"
@@ -15,6 +26,8 @@ class Jumble(Base):
     jumbled: Mapped[str] = mapped_column(nullable=False)
     unjumbled: Mapped[str] = mapped_column(nullable=False)
     clue_indices: Mapped[str] = mapped_column(nullable=False)
+    # bit i set when letter i is a clue letter, what the page needs without the order
+    clue_mask: Mapped[int] = mapped_column(nullable=False)
     jumble_game_id: Mapped[int] = mapped_column(ForeignKey("jumble_games.id"))
 
     jumble_game: Mapped["JumbleGame"] = relationship(back_populates="jumbles")
@@ -30,25 +43,41 @@ class Jumble(Base):
         super().__init__(*args, **kwargs)
         self.jumbled = jumbled
         self.unjumbled = unjumbled
-        self.clue_indices = ",".join(str(index) for index in clue_indices)
+        self.clue_indices = self.encode_clue_indices(clue_indices)
+        self.clue_mask = self.encode_clue_mask(clue_indices)
+
+    @staticmethod
+    def encode_clue_indices(clue_indices: list[int]) -> str:
+        return ",".join(str(index) for index in clue_indices)
+
+    @staticmethod
+    def encode_clue_mask(clue_indices: list[int]) -> int:
+        mask = 0
+        for index in clue_indices:
+            mask |= 1 << int(index)
+        return mask
 
     def get_clue_indices(self):
         return [int(index) for index in self.clue_indices.split(",")]
 
     def to_sanitized_dict(self):
-        return {"jumbled": self.jumbled, "clue_indices": self.get_clue_indices()}
+        return {"jumbled": self.jumbled, "clue_mask": self.clue_mask}
 
 
 class JumbleGame(Base):
     __tablename__ = "jumble_games"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    url_from: Mapped[str] = mapped_column(nullable=False)
+    # page the game was scraped from, the key scraped games are upserted on
+    url_from: Mapped[str] = mapped_column(nullable=False, index=True)
     value_date: Mapped[datetime] = mapped_column(nullable=True)
+    # calendar day of value_date, indexed so lookups by date don't scan the table
+    value_day: Mapped[date] = mapped_column(nullable=True, index=True)
     solution: Mapped[str] = mapped_column(nullable=False)
     solution_unjumbled: Mapped[str] = mapped_column(nullable=False)
     solution_jumbled: Mapped[str] = mapped_column(nullable=False)
     clue_sentence: Mapped[str] = mapped_column(nullable=False)
+    sanitized_solution: Mapped[str] = mapped_column(nullable=False)
 
     jumbles: Mapped[list["Jumble"]] = relationship(
         back_populates="jumble_game", cascade="all, delete-orphan"
@@ -62,6 +91,7 @@ class JumbleGame(Base):
         sanitize_solution('DAY IN (AND) DAY OUT', 'DAYINDAYOUT')
         >>> '*** ** (AND) *** ***'
         """
+        letters = set(letters.upper())
         output = []
         in_parenthesis = False
         for character in solution:
@@ -74,7 +104,7 @@ class JumbleGame(Base):
             # If character is not in parenthesis & found in letters, replace it with sub
             if (
                 not in_parenthesis
-                and character.upper() in letters.upper()
+                and character.upper() in letters
                 and character.isalpha()
             ):
                 output.append(sub)
@@ -82,10 +112,6 @@ class JumbleGame(Base):
                 output.append(character)
         return "".join(output)
 
-    @property
-    def sanitized_solution(self):
-        return self.sanitize_solution(self.solution_unjumbled, self.solution)
-
     def to_sanitized_dict(self) -> dict[str, Any]:
         return {
             "value_date": self.value_date.strftime(DISPLAY_DATE_FORMAT),
@@ -93,3 +119,37 @@ class JumbleGame(Base):
             "clue_sentence": self.clue_sentence,
             "jumbles": [t.to_sanitized_dict() for t in self.jumbles],
         }
+
+    def to_answers_dict(self) -> dict[str, Any]:
+        return {
+            "solution": self.solution,
+            "jumbles": [t.unjumbled for t in self.jumbles],
+        }
+
+
+class DailyPayload(Base):
+    """Read model of what is served for a day, serialized once at ingest (see ingest.refresh_daily_payloads)"""
+
+    __tablename__ = "daily_payloads"
+
+    value_day: Mapped[date] = mapped_column(primary_key=True)
+    jumble_game_id: Mapped[int] = mapped_column(
+        ForeignKey("jumble_games.id"), index=True
+    )
+    # JSON of JumbleGame.to_sanitized_dict()
+    payload: Mapped[str] = mapped_column(nullable=False)
+    # JSON of JumbleGame.to_answers_dict()
+    answers: Mapped[str] = mapped_column(nullable=False)
+
+    @staticmethod
+    def dumps(data: dict[str, Any]) -> str:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def from_game(cls, game: JumbleGame) -> "DailyPayload":
+        return cls(
+            value_day=game.value_day,
+            jumble_game_id=game.id,
+            payload=cls.dumps(game.to_sanitized_dict()),
+            answers=cls.dumps(game.to_answers_dict()),
+        )
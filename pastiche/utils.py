@@ -0,0 +1,17 @@
+import json
+import os
+from pathlib import Path
+
+
+def write_text_atomic(path: Path, text: str) -> None:
+    """Write text through a temporary file, so readers never see it half written"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = path.with_suffix(".part")
+    partial_path.write_text(text, encoding="utf-8")
+    os.replace(partial_path, path)
+
+
+def write_json_atomic(path: Path, data, **kwargs) -> None:
+    """Write data as JSON (dumped with kwargs) through a temporary file"""
+    write_text_atomic(path, json.dumps(data, **kwargs))